@@ -5,7 +5,9 @@ from typing import List, Dict
 # modules/cluster/analysis.py
 import numpy as np
 from sklearn.cluster import MiniBatchKMeans
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from .engines import FitResult, fit
 
 def cluster_analysis(points: List[Dict], config, is_top: bool) -> List[int]:
     """Legacy points-based path (discouraged). Uses memmap but builds an id->row dict."""
@@ -42,25 +44,19 @@ def cluster_analysis(points: List[Dict], config, is_top: bool) -> List[int]:
         p += sl.size
     return labels.tolist()
 
-def cluster_analysis_by_indices(idx: np.ndarray, config: Dict, is_top: bool) -> list[int]:
-    """Preferred path: purely index-based, no dicts, minimal RAM."""
-    dims = config["scratch"]["dims"]
-    N = int(config["scratch"]["N"])
-    Xf16 = np.memmap(config["scratch"]["fp16_path"], dtype=np.float16, mode="r", shape=(N, dims))
-
+def _n_clusters(config: Dict, is_top: bool, n_points: int) -> int:
     n_clusters = (config.get("n_clusters_base", 3) if is_top and config.get("n_clusters_base")
                   else config.get("n_clusters", 5))
-    batch = min(8192, max(1024, 32 * n_clusters))
-    km = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch, init_size=max(10*n_clusters, 3*batch),
-                         n_init="auto", random_state=42, max_iter=100)
+    # k-means can't make more clusters than it has points
+    return max(1, min(n_clusters, n_points))
 
-    for s in range(0, idx.size, batch):
-        km.partial_fit(Xf16[idx[s:s+batch]].astype(np.float32, copy=False))
+def cluster_fit_by_indices(idx: np.ndarray, config: Dict, is_top: bool, init: Optional[np.ndarray] = None) -> FitResult:
+    """Clusters rows idx of the scratch store with the engine config["method"] selects (see engines.py)."""
+    dims = config["scratch"]["dims"]
+    N = int(config["scratch"]["N"])
+    Xf16 = np.memmap(config["scratch"]["fp16_path"], dtype=np.float16, mode="r", shape=(N, dims))
+    return fit(Xf16, idx, _n_clusters(config, is_top, idx.size), config, init=init)
 
-    labels = np.empty(idx.size, dtype=np.int32)
-    p = 0
-    for s in range(0, idx.size, batch):
-        sl = idx[s:s+batch]
-        labels[p:p+sl.size] = km.predict(Xf16[sl].astype(np.float32, copy=False))
-        p += sl.size
-    return labels.tolist()
+def cluster_analysis_by_indices(idx: np.ndarray, config: Dict, is_top: bool) -> list[int]:
+    """Preferred path: purely index-based, no dicts. Labels in idx order."""
+    return cluster_fit_by_indices(idx, config, is_top).labels.tolist()
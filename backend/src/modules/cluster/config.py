@@ -2,7 +2,7 @@
 default_config = {
     "max_depth": 2,
     "min_points": 3,
-    "method": "kmeans",
+    "method": "kmeans",  # kmeans | auto | minibatch | full | spherical | ward (see engines.py)
     "n_clusters": 3,  # ADD this for KMeans
     "skip_llm": False,  # ADD this for LLM control,
     "job_id": 1,
@@ -0,0 +1,247 @@
+# modules/cluster/engines.py
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Optional
+
+import numpy as np
+from sklearn.cluster import AgglomerativeClustering, KMeans, MiniBatchKMeans, kmeans_plusplus
+
+logger = logging.getLogger(__name__)
+
+# Nodes whose fp32 vectors fit in this many bytes are gathered once and fit with full KMeans
+# (2 MiB = 2048 points at 256 dims; see scripts/bench_cluster_nodes.py)
+CLUSTER_IN_RAM_MAX_BYTES = int(os.getenv("CLUSTER_IN_RAM_MAX_BYTES", str(2 << 20)))
+# lloyd | elkan, for the in-RAM path
+CLUSTER_KMEANS_ALGORITHM = os.getenv("CLUSTER_KMEANS_ALGORITHM", "lloyd")
+# Seconds one node may take under method="auto" (config["time_budget"] overrides)
+CLUSTER_TIME_BUDGET = float(os.getenv("CLUSTER_TIME_BUDGET", "1.0"))
+# Ward is fit on at most this many sampled points; the rest go to the nearest centroid
+CLUSTER_WARD_SAMPLE = int(os.getenv("CLUSTER_WARD_SAMPLE", "2000"))
+
+# "auto" never gathers more than this into RAM, whatever the budget
+AUTO_MAX_RAM_BYTES = 1 << 30
+# Seconds per point x cluster x dim, before this process has timed any fits of its own
+PRIOR_RATES = {"full": 7e-9, "minibatch": 5e-9}
+ASSIGN_BATCH = 8192
+MAX_ITER = 100
+
+
+class FitResult:
+    """ One node's clustering: labels in idx order, centroids, inertia and how long it took. """
+
+    def __init__(self, engine: str, labels: np.ndarray, centroids: np.ndarray, inertia: float, iterations: int = 0):
+        self.engine = engine
+        self.labels = labels
+        self.centroids = centroids
+        # Sum of squared euclidean distances to the assigned centroid, on every engine
+        self.inertia = float(inertia)
+        # Lloyd iterations (full, spherical) or partial_fit steps (minibatch); 0 for ward
+        self.iterations = int(iterations)
+        self.seconds = 0.0
+        self.warm = False
+
+
+# =========================
+# Engines
+# =========================
+
+def _gather(Xf16: np.ndarray, idx: np.ndarray):
+    """ The node's rows as contiguous fp32, read in row order for memmap locality, plus that order. """
+    order = np.argsort(idx, kind="stable")
+    return np.ascontiguousarray(Xf16[idx[order]], dtype=np.float32), order
+
+
+def _unsort(values: np.ndarray, order: np.ndarray) -> np.ndarray:
+    out = np.empty(values.size, dtype=np.int32)
+    out[order] = values
+    return out
+
+
+def _assign(Xf16: np.ndarray, idx: np.ndarray, centroids: np.ndarray):
+    """ Nearest-centroid labels and inertia for idx, streamed from the memmap. """
+    labels = np.empty(idx.size, dtype=np.int32)
+    c_sq = (centroids ** 2).sum(axis=1)
+    inertia = 0.0
+    for s in range(0, idx.size, ASSIGN_BATCH):
+        X = Xf16[idx[s:s+ASSIGN_BATCH]].astype(np.float32, copy=False)
+        d = (X ** 2).sum(axis=1)[:, None] - 2 * X @ centroids.T + c_sq[None, :]
+        labels[s:s+X.shape[0]] = d.argmin(axis=1)
+        inertia += float(np.maximum(d.min(axis=1), 0).sum())
+    return labels, inertia
+
+
+def fit_minibatch(Xf16: np.ndarray, idx: np.ndarray, n_clusters: int, config: Dict, init: Optional[np.ndarray] = None) -> FitResult:
+    """ Two passes over the memmap in batches: partial_fit, then assignment. Constant memory. """
+    batch = min(8192, max(1024, 32 * n_clusters))
+    km = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch, init_size=max(10*n_clusters, 3*batch),
+                         init="k-means++" if init is None else init, n_init="auto" if init is None else 1,
+                         random_state=42, max_iter=MAX_ITER)
+    for s in range(0, idx.size, batch):
+        km.partial_fit(Xf16[idx[s:s+batch]].astype(np.float32, copy=False))
+    centroids = km.cluster_centers_.astype(np.float32)
+    labels, inertia = _assign(Xf16, idx, centroids)
+    return FitResult("minibatch", labels, centroids, inertia, km.n_steps_)
+
+
+def fit_full(Xf16: np.ndarray, idx: np.ndarray, n_clusters: int, config: Dict, init: Optional[np.ndarray] = None) -> FitResult:
+    """ One gather into RAM and a full KMeans fit; labels_ used directly. """
+    X, order = _gather(Xf16, idx)
+    km = KMeans(n_clusters=n_clusters, init="k-means++" if init is None else init, n_init="auto" if init is None else 1,
+                random_state=42, max_iter=MAX_ITER, algorithm=config.get("kmeans_algorithm", CLUSTER_KMEANS_ALGORITHM))
+    km.fit(X)
+    return FitResult("full", _unsort(km.labels_, order), km.cluster_centers_.astype(np.float32), km.inertia_, km.n_iter_)
+
+
+def fit_spherical(Xf16: np.ndarray, idx: np.ndarray, n_clusters: int, config: Dict, init: Optional[np.ndarray] = None) -> FitResult:
+    """ k-means on the unit sphere: rows normalised, points go to the most cosine-similar unit centroid. """
+    raw, order = _gather(Xf16, idx)
+    X = raw / np.maximum(np.linalg.norm(raw, axis=1, keepdims=True), 1e-12)
+    if init is None:
+        centroids, _ = kmeans_plusplus(X, n_clusters, random_state=42)
+    else:
+        centroids = init / np.maximum(np.linalg.norm(init, axis=1, keepdims=True), 1e-12)
+    labels = np.full(X.shape[0], -1, dtype=np.int32)
+    iterations = 0
+    for iterations in range(1, MAX_ITER + 1):
+        new_labels = (X @ centroids.T).argmax(axis=1).astype(np.int32)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for j in range(n_clusters):
+            members = X[labels == j]
+            if len(members):
+                c = members.sum(axis=0)
+                centroids[j] = c / max(np.linalg.norm(c), 1e-12)
+    # Measured on the stored (unnormalised) vectors against each cluster's mean, like the other engines
+    inertia = 0.0
+    for j in range(n_clusters):
+        members = raw[labels == j]
+        if len(members):
+            inertia += float(((members - members.mean(axis=0)) ** 2).sum())
+    return FitResult("spherical", _unsort(labels, order), centroids.astype(np.float32), inertia, iterations)
+
+
+def fit_ward(Xf16: np.ndarray, idx: np.ndarray, n_clusters: int, config: Dict, init: Optional[np.ndarray] = None) -> FitResult:
+    """
+    Ward linkage on a random sample of the node; every point then joins its nearest sample-cluster
+    mean. Hierarchical, so `init` is ignored.
+    """
+    sample_size = min(idx.size, int(config.get("ward_sample", CLUSTER_WARD_SAMPLE)))
+    sample = np.sort(np.random.default_rng(42).choice(idx, size=sample_size, replace=False))
+    X = Xf16[sample].astype(np.float32)
+    sample_labels = AgglomerativeClustering(n_clusters=n_clusters, linkage="ward").fit_predict(X)
+    centroids = np.stack([X[sample_labels == j].mean(axis=0) for j in range(n_clusters)]).astype(np.float32)
+    labels, inertia = _assign(Xf16, idx, centroids)
+    return FitResult("ward", labels, centroids, inertia)
+
+
+ENGINES: Dict[str, Callable[..., FitResult]] = {
+    "minibatch": fit_minibatch,
+    "full": fit_full,
+    "spherical": fit_spherical,
+    "ward": fit_ward,
+}
+
+
+# =========================
+# Selection
+# =========================
+
+class EngineStats:
+    """ Fits, points, seconds and inertia per engine, for one job. """
+
+    def __init__(self):
+        self.by_engine: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def record(self, result: FitResult, n: int, work: float) -> None:
+        m = self.by_engine[result.engine]
+        m["fits"] += 1
+        m["points"] += n
+        m["seconds"] += result.seconds
+        m["inertia"] += result.inertia
+        m["iterations"] += result.iterations
+        m["warm"] += result.warm
+        m["work"] += work
+
+    def merge(self, other: Dict[str, Dict[str, float]]) -> None:
+        for engine, values in other.items():
+            for k, v in values.items():
+                self.by_engine[engine][k] += v
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        return {engine: dict(m) for engine, m in self.by_engine.items()}
+
+    def report(self) -> str:
+        lines = []
+        for engine, m in sorted(self.by_engine.items()):
+            lines.append(f"Clustering {engine}: {m['fits']:.0f} fits over {m['points']:.0f} points, "
+                         f"{m['seconds']:.2f}s ({m['seconds'] / m['fits']:.3f}s mean), inertia {m['inertia']:.1f}, "
+                         f"{m['iterations'] / m['fits']:.1f} iterations mean, {m['warm']:.0f} warm-started")
+        return "\n".join(lines) or "Clustering: no fits"
+
+
+_stats: Dict[object, EngineStats] = defaultdict(EngineStats)
+_rates: Dict[str, float] = dict(PRIOR_RATES)
+_lock = threading.Lock()
+
+
+def merge_job_stats(job_id, metrics: Dict[str, Dict[str, float]]) -> None:
+    """ Adds stats gathered in another process (see recursion.cluster_recursive_parallel). """
+    with _lock:
+        _stats[job_id].merge(metrics)
+
+
+def pop_job_stats(job_id) -> EngineStats:
+    """ The job's stats, forgotten afterwards. """
+    with _lock:
+        return _stats.pop(job_id, None) or EngineStats()
+
+
+def select_engine(method: str, n: int, dims: int, n_clusters: int, config: Dict) -> str:
+    """
+    Resolves config["method"] to an engine. "kmeans" (what every existing job stores) keeps
+    the size rule: full KMeans for nodes under CLUSTER_IN_RAM_MAX_BYTES, minibatch above.
+    "auto" also uses full KMeans on larger nodes while its predicted time fits the budget.
+    """
+    in_ram = n * dims * 4 <= config.get("in_ram_max_bytes", CLUSTER_IN_RAM_MAX_BYTES)
+    if method == "kmeans":
+        return "full" if in_ram else "minibatch"
+    if method == "auto":
+        if in_ram:
+            return "full"
+        budget = float(config.get("time_budget", CLUSTER_TIME_BUDGET))
+        with _lock:
+            predicted = _rates["full"] * n * n_clusters * dims
+        return "full" if n * dims * 4 <= AUTO_MAX_RAM_BYTES and predicted <= budget else "minibatch"
+    if method in ENGINES:
+        return method
+    raise ValueError(f"Unknown clustering method {method!r}; expected kmeans, auto or one of {sorted(ENGINES)}")
+
+
+def fit(Xf16: np.ndarray, idx: np.ndarray, n_clusters: int, config: Dict, engine: Optional[str] = None,
+        init: Optional[np.ndarray] = None) -> FitResult:
+    """
+    Clusters the rows `idx` of the fp16 store with the configured engine, timing and recording
+    the fit. `init` (n_clusters x dims, e.g. a previous job's centroids) warm-starts the engines
+    that take one; an init of any other shape is ignored.
+    """
+    dims = Xf16.shape[1]
+    engine = engine or select_engine(config.get("method", "kmeans"), idx.size, dims, n_clusters, config)
+    if init is not None and init.shape != (n_clusters, dims):
+        init = None
+    started = time.perf_counter()
+    result = ENGINES[engine](Xf16, idx, n_clusters, config, init=None if init is None else init.astype(np.float32))
+    result.seconds = time.perf_counter() - started
+    result.warm = init is not None and engine != "ward"
+
+    work = float(idx.size) * n_clusters * dims
+    with _lock:
+        # Tiny fits are all overhead; they'd only skew the rate
+        if engine in _rates and result.seconds > 0.05:
+            _rates[engine] = 0.8 * _rates[engine] + 0.2 * result.seconds / work
+        _stats[config.get("job_id")].record(result, idx.size, work)
+    logger.debug(f"{engine} fit: {idx.size} points, k={n_clusters}, {result.seconds:.3f}s, inertia {result.inertia:.1f}")
+    return result
@@ -1,7 +1,6 @@
 from typing import Dict, List
-from groq import Groq
-import os
 import random
+from ..utils.llm_gateway import get_gateway
 
 def summarise_cluster(cluster_points: List, title: str) -> str:
     """Summarises a cluster of points based on their values and title using LLM"""
@@ -18,17 +17,15 @@ def summarise_cluster(cluster_points: List, title: str) -> str:
     {' | '.join(point_texts)}"""
 
     try:
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": model_input}],
+        content = get_gateway().complete(
+            [{"role": "user", "content": model_input}],
+            tag="summarise_cluster",
             temperature=0.0,
             top_p=0.9,
             max_tokens=300
         )
         
-        return response.choices[0].message.content.strip()
+        return content.strip()
     except Exception as e:
         print(f"Error generating cluster summary: {e}")
         return f"Cluster about {title} with {len(cluster_points)} points"
@@ -46,17 +43,15 @@ def title_cluster(cluster_points: List, parent_title: str) -> str:
     Please only return a single phrase (2-4 words) that describes the category."""
 
     try:
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": model_input}],
+        content = get_gateway().complete(
+            [{"role": "user", "content": model_input}],
+            tag="title_cluster",
             temperature=0.0,
             top_p=0.9,
             max_tokens=50
         )
         
-        return response.choices[0].message.content.strip()
+        return content.strip()
     except Exception as e:
         print(f"Error generating cluster title: {e}")
         return f"Cluster {len(cluster_points)} points"
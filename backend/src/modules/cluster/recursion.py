@@ -8,18 +8,40 @@ from .llm_labelling import summarise_cluster, title_cluster, fetch_text_samples
 from .save import save_cluster_ids
 from .analysis import cluster_analysis_by_indices
 # modules/cluster/recursion.py
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
-from .analysis import cluster_analysis_by_indices
+from .analysis import cluster_fit_by_indices
+from .engines import merge_job_stats, pop_job_stats
 from .save import save_cluster_ids
+from .warm import child_path, save_centroid
 from datetime import datetime
 
-def cluster_recursive_idx(conn, idx, config, filters, depth, parent_cluster_id=None):
+logger = logging.getLogger(__name__)
+
+# Processes for parallel subtree clustering (config["workers"] overrides); 1 = sequential
+CLUSTER_WORKERS = int(os.getenv("CLUSTER_WORKERS", str(min(os.cpu_count() or 1, 8))))
+# Smaller jobs aren't worth the process start-up
+CLUSTER_PARALLEL_MIN_POINTS = int(os.getenv("CLUSTER_PARALLEL_MIN_POINTS", "20000"))
+
+
+def _save_node(conn, idx, config, filters, depth, parent_cluster_id=None, path="", centroid=None, warm=None):
+    """
+    Titles/summarises one node (LLM) and writes it with its points and its centroid. A node
+    whose centroid still matches its counterpart in the previous job (`warm`) keeps that
+    node's title and summary instead. Returns its cluster_id.
+    """
     N = int(config["scratch"]["N"])
     ids_all = np.memmap(config["scratch"]["ids_path"], dtype=np.int64, mode="r", shape=(N,))
     point_ids = ids_all[idx].astype(int).tolist()
 
     title = summary = None
-    if (depth > 0 or config.get("search")) and not config.get("skip_llm"):
+    reused = warm.labels_for(centroid) if warm is not None else None
+    if reused:
+        title, summary = reused
+        logger.debug(f"Reusing labels of cluster {warm.cluster_id} for node {path!r}: {title}")
+    elif (depth > 0 or config.get("search")) and not config.get("skip_llm"):
         texts = fetch_text_samples(conn, point_ids, sample_size=30)
         if texts:
             faux_points = [{"text": t} for t in texts]
@@ -33,17 +55,105 @@ def cluster_recursive_idx(conn, idx, config, filters, depth, parent_cluster_id=N
                                   filters_used=filters, config=config, job_id=config["job_id"],
                                   title=title, summary=summary,
                                   point_ids=point_ids)
+    projection = None
+    if depth == 0 and config["scratch"].get("projection_path"):
+        with open(config["scratch"]["projection_path"], "rb") as f:
+            projection = f.read()
+    save_centroid(conn, cluster_id, config["job_id"], path, config["scratch"].get("space", ""),
+                  centroid=centroid, projection=projection)
+    return cluster_id
+
 
+def _split(idx, config, depth, warm=None):
+    """
+    A node's children as (label, idx, centroid), or [] if it is a leaf. Reads only the memmap.
+    With `warm` (the matching node of the previous job) k-means starts from its children's centroids.
+    """
     if depth >= config["max_depth"] or len(idx) < config.get("min_points", 5):
-        return
+        return []
 
-    labels = np.asarray(cluster_analysis_by_indices(idx, config, is_top=(depth == 0)), dtype=np.int32)
+    result = cluster_fit_by_indices(idx, config, is_top=(depth == 0), init=warm.init() if warm is not None else None)
+    labels = result.labels
     order = np.argsort(labels, kind="stable")
     labels_sorted = labels[order]; idx_sorted = idx[order]
     uniq, starts = np.unique(labels_sorted, return_index=True)
     starts = list(starts) + [len(labels_sorted)]
 
-    for j in range(len(uniq)):
-        child_idx = idx_sorted[starts[j]:starts[j+1]]
-        if child_idx.size:
-            cluster_recursive_idx(conn, child_idx, config, filters, depth + 1, parent_cluster_id=cluster_id)
+    children = [(int(uniq[j]), idx_sorted[starts[j]:starts[j+1]], result.centroids[uniq[j]]) for j in range(len(uniq))]
+    return [child for child in children if child[1].size]
+
+
+def _match(warm, children):
+    """ The previous job's node for each child label ({} without a previous tree). """
+    return warm.match({label: centroid for label, _, centroid in children}) if warm is not None else {}
+
+
+def cluster_recursive_idx(conn, idx, config, filters, depth, parent_cluster_id=None, warm=None, path="", centroid=None):
+    workers = int(config.get("workers", CLUSTER_WORKERS))
+    if depth == 0 and workers > 1 and config["max_depth"] >= 2 and len(idx) >= CLUSTER_PARALLEL_MIN_POINTS:
+        return cluster_recursive_parallel(conn, idx, config, filters, workers, warm=warm)
+
+    cluster_id = _save_node(conn, idx, config, filters, depth, parent_cluster_id, path, centroid, warm)
+    children = _split(idx, config, depth, warm)
+    matched = _match(warm, children)
+    for label, child_idx, child_centroid in children:
+        cluster_recursive_idx(conn, child_idx, config, filters, depth + 1, parent_cluster_id=cluster_id,
+                              warm=matched.get(label), path=child_path(path, label), centroid=child_centroid)
+
+
+# =========================
+# Parallel subtrees
+# =========================
+
+def _partition_subtree(idx, config, depth, label, centroid, warm):
+    """
+    Worker: the full partition of one subtree, as nested {"idx", "depth", "label", "centroid",
+    "children"}, and the worker's engine stats for it. No database access; BLAS is kept to
+    one thread so workers don't oversubscribe cores.
+    """
+    from threadpoolctl import threadpool_limits
+    with threadpool_limits(limits=1):
+        tree = _partition(idx, config, depth, label, centroid, warm)
+    return tree, pop_job_stats(config.get("job_id")).metrics()
+
+
+def _partition(idx, config, depth, label, centroid, warm):
+    children = _split(idx, config, depth, warm)
+    matched = _match(warm, children)
+    return {"idx": idx, "depth": depth, "label": label, "centroid": centroid,
+            "children": [_partition(child_idx, config, depth + 1, child_label, child_centroid, matched.get(child_label))
+                         for child_label, child_idx, child_centroid in children]}
+
+
+def _save_tree(conn, node, config, filters, parent_cluster_id, path, warm):
+    cluster_id = _save_node(conn, node["idx"], config, filters, node["depth"], parent_cluster_id,
+                            path, node["centroid"], warm)
+    # Matched again here, against the parent's own WarmNodes (the worker had copies)
+    matched = _match(warm, [(c["label"], c["idx"], c["centroid"]) for c in node["children"]])
+    for child in node["children"]:
+        _save_tree(conn, child, config, filters, cluster_id, child_path(path, child["label"]), matched.get(child["label"]))
+
+
+def cluster_recursive_parallel(conn, idx, config, filters, workers, warm=None):
+    """
+    Same tree as the sequential recursion, but once the root is split each child subtree is
+    partitioned in its own process. Workers read the fp16 memmap from config["scratch"] and
+    return index trees; titles, summaries and every database write happen here, on `conn`,
+    as each subtree comes back.
+    """
+    root_id = _save_node(conn, idx, config, filters, 0, warm=warm)
+    children = _split(idx, config, 0, warm)
+    matched = _match(warm, children)
+    worker_config = {k: v for k, v in config.items() if k != "scratch"}
+    worker_config["scratch"] = {k: config["scratch"][k] for k in ("ids_path", "fp16_path", "dims", "N")}
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(children)) or 1, mp_context=context) as pool:
+        futures = {pool.submit(_partition_subtree, child_idx, worker_config, 1, label, centroid, matched.get(label)): label
+                   for label, child_idx, centroid in children}
+        for future in as_completed(futures):
+            tree, stats = future.result()
+            merge_job_stats(config.get("job_id"), stats)
+            label = futures[future]
+            _save_tree(conn, tree, config, filters, root_id, child_path("", label), matched.get(label))
+    logger.info(f"Clustered {len(children)} subtrees of {len(idx)} points across {workers} processes")
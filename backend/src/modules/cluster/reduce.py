@@ -0,0 +1,166 @@
+# modules/cluster/reduce.py
+import fcntl
+import hashlib
+import io
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+import numpy as np
+from sklearn.decomposition import PCA
+
+from .store import TMP_DIR
+
+logger = logging.getLogger(__name__)
+
+# off | pca | random (Gaussian random projection); config["reduce"] overrides
+CLUSTER_REDUCE = os.getenv("CLUSTER_REDUCE", "off").lower()
+# Output dims of the reduction; config["reduce_dims"] overrides
+CLUSTER_REDUCE_DIMS = int(os.getenv("CLUSTER_REDUCE_DIMS", "64"))
+# Rows the PCA is fitted on
+CLUSTER_REDUCE_SAMPLE = int(os.getenv("CLUSTER_REDUCE_SAMPLE", "50000"))
+
+REDUCE_METHODS = {"off", "pca", "random"}
+PROJECT_BATCH = 65536
+
+
+class Projection:
+    """
+    A fitted linear reduction, x -> (x - mean) @ components. Saved next to the reduced matrix
+    so points added later (snapshot appends, assignment of new points) use the same basis.
+    """
+
+    def __init__(self, method: str, mean: np.ndarray, components: np.ndarray):
+        self.method = method
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)  # (dims, out_dims)
+
+    @property
+    def out_dims(self) -> int:
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, X: np.ndarray, method: str, out_dims: int, seed: int = 42) -> "Projection":
+        if method == "pca":
+            pca = PCA(n_components=out_dims, svd_solver="randomized", random_state=seed).fit(X)
+            return cls(method, pca.mean_, pca.components_.T)
+        if method == "random":
+            rng = np.random.default_rng(seed)
+            return cls(method, np.zeros(X.shape[1]), rng.normal(0.0, 1.0 / np.sqrt(out_dims), (X.shape[1], out_dims)))
+        raise ValueError(f"Unknown reduction {method!r}; expected one of {sorted(REDUCE_METHODS)}")
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return (np.asarray(X, dtype=np.float32) - self.mean) @ self.components
+
+    @property
+    def key(self) -> str:
+        """ Identifies the basis: vectors from projections with the same key are comparable. """
+        digest = hashlib.sha1(self.method.encode() + self.mean.tobytes() + self.components.tobytes()).hexdigest()
+        return f"{self.method}{self.out_dims}:{digest[:16]}"
+
+    def to_bytes(self) -> bytes:
+        buf = io.BytesIO()
+        np.savez(buf, method=self.method, mean=self.mean, components=self.components)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Projection":
+        with np.load(io.BytesIO(data)) as f:
+            return cls(str(f["method"]), f["mean"], f["components"])
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Projection":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def _sample_rows(Xf16: np.ndarray, n: int, size: int) -> np.ndarray:
+    rows = np.arange(n) if n <= size else np.sort(np.random.default_rng(42).choice(n, size=size, replace=False))
+    return Xf16[rows].astype(np.float32)
+
+
+def _reduce_into(Xf16: np.ndarray, n: int, method: str, out_dims: int, proj_path: str, out_path: str) -> Projection:
+    """
+    Fits (or loads) the projection and makes out_path hold rows [0, n) of Xf16 projected, as
+    fp16. Rows already there are kept, so a grown source only projects its new rows.
+    """
+    if os.path.exists(proj_path):
+        projection = Projection.load(proj_path)
+    else:
+        t0 = time.perf_counter()
+        projection = Projection.fit(_sample_rows(Xf16, n, CLUSTER_REDUCE_SAMPLE), method, out_dims)
+        projection.save(proj_path)
+        logger.info(f"Fitted {method} projection {Xf16.shape[1]} -> {out_dims} dims in {time.perf_counter() - t0:.2f}s")
+
+    row_bytes = out_dims * 2
+    with open(out_path, "ab") as f:
+        done = f.tell() // row_bytes
+        f.truncate(done * row_bytes)  # drop a partial row left by an interrupted run
+        for s in range(done, n, PROJECT_BATCH):
+            f.write(projection.transform(Xf16[s:min(s + PROJECT_BATCH, n)]).astype(np.float16).tobytes())
+    return projection
+
+
+def reduce_scratch(config: Dict, job_id: int, cache_dir: Optional[str] = None,
+                   projection: Optional[Projection] = None) -> Dict:
+    """
+    config["scratch"] pointed at a reduced copy of its fp16 store, for every level of the
+    recursion. With `cache_dir` (a snapshot version) the projection and reduced matrix are
+    shared by every job on that snapshot; otherwise they are per job, in TMP_DIR, using
+    `projection` (e.g. a previous job's, to stay in its basis) if it fits instead of a new fit.
+    The unreduced store stays in scratch as source_fp16_path / source_dims.
+    """
+    scratch = config["scratch"]
+    method = str(config.get("reduce", CLUSTER_REDUCE)).lower()
+    out_dims = int(config.get("reduce_dims", CLUSTER_REDUCE_DIMS))
+    if method not in REDUCE_METHODS:
+        raise ValueError(f"Unknown reduction {method!r}; expected one of {sorted(REDUCE_METHODS)}")
+    if method == "off" or out_dims >= scratch["dims"]:
+        return scratch
+
+    N, dims = int(scratch["N"]), int(scratch["dims"])
+    Xf16 = np.memmap(scratch["fp16_path"], dtype=np.float16, mode="r", shape=(N, dims))
+    t0 = time.perf_counter()
+    if cache_dir:
+        proj_path = os.path.join(cache_dir, f"projection_{method}{out_dims}.npz")
+        out_path = os.path.join(cache_dir, f"X_{method}{out_dims}.f16")
+        # One job fits/extends it; the others wait and reuse
+        with open(os.path.join(cache_dir, f"reduce_{method}{out_dims}.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            _reduce_into(Xf16, N, method, out_dims, proj_path, out_path)
+    else:
+        proj_path, out_path = paths_for_job(job_id)
+        for p in (proj_path, out_path):
+            _remove(p)
+        if projection is not None and (projection.method, projection.out_dims, projection.mean.size) == (method, out_dims, dims):
+            projection.save(proj_path)
+        _reduce_into(Xf16, N, method, out_dims, proj_path, out_path)
+    logger.info(f"Job {job_id}: clustering on {method} {dims} -> {out_dims} dims ({time.perf_counter() - t0:.2f}s)")
+
+    return {**scratch, "fp16_path": out_path, "dims": out_dims, "projection_path": proj_path,
+            "source_fp16_path": scratch["fp16_path"], "source_dims": dims}
+
+
+def paths_for_job(job_id: int):
+    return (os.path.join(TMP_DIR, f"projection_{job_id}.npz"),
+            os.path.join(TMP_DIR, f"Xreduced_{job_id}.f16"))
+
+
+def cleanup_reduced(job_id: int) -> None:
+    """ Deletes a job's own projection and reduced matrix (snapshot ones are kept). """
+    for p in paths_for_job(job_id):
+        _remove(p)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
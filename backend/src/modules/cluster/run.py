@@ -2,17 +2,38 @@
 import logging
 import numpy as np
 
+from .engines import pop_job_stats
 from .recursion import cluster_recursive_idx
 from ..utils.database_utils import get_db_connection
 from ..utils.cluster_utils import finalise_job
+from ..utils.llm_gateway import get_gateway
 from .store import (
     build_local_fp16_store,
     build_local_fp16_store_search,
     cleanup_store,
 )
+from .reduce import cleanup_reduced, reduce_scratch
+from .snapshot import CLUSTER_SNAPSHOT, open_snapshot
+from .store_cache import get_store_cache, store_spec
+from .warm import ensure_centroid_schema, previous_tree, space_key
 
 logger = logging.getLogger(__name__)
 
+def _cluster(conn, root_idx, config, filters, job_id, cache_dir=None):
+    """
+    Reduces the scratch store if configured, then runs the recursion, warm-started from the
+    latest completed job with overlapping filters when it was clustered in the same space.
+    """
+    warm, previous_space, projection, previous_id = previous_tree(conn, config, filters, job_id)
+    config["scratch"] = reduce_scratch(config, job_id, cache_dir=cache_dir, projection=projection)
+    config["scratch"]["space"] = space_key(config["scratch"])
+    if warm is not None and previous_space != config["scratch"]["space"]:
+        logger.info(f"Job {job_id}: job {previous_id} was clustered in another space; not warm-starting")
+        warm = None
+    elif warm is not None:
+        logger.info(f"Job {job_id}: warm-starting from job {previous_id}")
+    cluster_recursive_idx(conn, root_idx, config, filters, depth=0, warm=warm)
+
 def run_clustering(config, filters=None):
     conn = get_db_connection()
     filters = dict(filters or {})
@@ -23,10 +44,36 @@ def run_clustering(config, filters=None):
 
     job_id = int(config.get("job_id"))
     search_limit = int(config.get("search_limit", 500))
+    snapshot = None
+    store_cache, spec, cached = get_store_cache(), store_spec(filters, search_limit), None
 
     try:
+        ensure_centroid_schema(conn)
+        # Full jobs select their rows from the shared snapshot; no export needed
+        if not filters.get("query") and CLUSTER_SNAPSHOT == "on":
+            try:
+                snapshot = open_snapshot(conn)
+            except Exception as e:
+                logger.warning(f"Snapshot unavailable, exporting a per-job store instead: {e}")
+                conn.rollback()
+        if snapshot is not None:
+            root_idx = snapshot.select(filters)
+            if root_idx.size == 0:
+                logger.warning("No points found.")
+                return
+            config["scratch"] = snapshot.scratch()
+            logger.info(f"Job {job_id}: {root_idx.size} of {snapshot.n} points from snapshot v{snapshot.version}")
+            _cluster(conn, root_idx, config, filters, job_id, cache_dir=snapshot.dir)
+            logger.info(get_gateway().report())
+            return
+
+        # Reuse a cached store for the same filters (and query) if there is one
+        cached = store_cache.acquire(spec) if store_cache else None
+        if cached is not None:
+            ids_path, fp16_path, N, dims = cached["ids_path"], cached["fp16_path"], cached["N"], cached["dims"]
+            logger.info(f"Job {job_id}: reusing cached store ({N} points)")
         # Choose search vs full export
-        if filters.get("query"):
+        elif filters.get("query"):
             ids_path, fp16_path, N, dims = build_local_fp16_store_search(
                 conn,
                 filters,
@@ -40,6 +87,11 @@ def run_clustering(config, filters=None):
                 job_id,
             )
 
+        if cached is None and store_cache and N > 0:
+            cached = store_cache.adopt(spec, ids_path, fp16_path, N, dims)
+            if cached is not None:
+                ids_path, fp16_path, N, dims = cached["ids_path"], cached["fp16_path"], cached["N"], cached["dims"]
+
         if N == 0:
             logger.warning("No points found.")
             # Clean up any empty files we just created and bail
@@ -56,15 +108,23 @@ def run_clustering(config, filters=None):
 
         # Run clustering over [0..N)
         root_idx = np.arange(N, dtype=np.int64)
-        cluster_recursive_idx(conn, root_idx, config, filters, depth=0)
+        _cluster(conn, root_idx, config, filters, job_id)
+        logger.info(get_gateway().report())
 
     finally:
+        # Per-engine fit time and inertia for the job (always popped, so failed jobs don't linger)
+        logger.info(pop_job_stats(config.get("job_id")).report())
+        if snapshot is not None:
+            snapshot.close()
+        if cached is not None:
+            store_cache.release(cached)
         conn.close()
         # Keep your sentinel job-id behaviour
         if str(config.get("job_id")) != "1000000":
             finalise_job(config["job_id"])
-        # Remove local tmp files
+        # Remove local tmp files (cached stores have already been moved out)
         cleanup_store(job_id)
+        cleanup_reduced(job_id)
 
 
 def main():
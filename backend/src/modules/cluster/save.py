@@ -15,10 +15,14 @@ def save_cluster_ids(conn, *, parent_cluster_id, layer, filters_used, config, jo
 
         if point_ids:
             rows = [(cluster_id, pid) for pid in point_ids]
+            # Points deleted since the job's store or snapshot was read (e.g. a revised debate
+            # re-synced) are dropped here rather than failing the insert on the point FK
             execute_values(cur, """
                 INSERT INTO cluster_points (cluster_id, point_id)
-                VALUES %s
+                SELECT v.cluster_id, v.point_id
+                FROM (VALUES %s) AS v(cluster_id, point_id)
+                WHERE EXISTS (SELECT 1 FROM point p WHERE p.point_id = v.point_id)
                 ON CONFLICT (cluster_id, point_id) DO NOTHING
-            """, rows, template="(%s,%s)")
+            """, rows, template="(%s::integer,%s::bigint)")
     conn.commit()
     return cluster_id
@@ -0,0 +1,368 @@
+# modules/cluster/snapshot.py
+import argparse
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .store import FETCH_BATCH
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv("CLUSTER_SNAPSHOT_DIR", os.path.join(os.path.expanduser("~"), ".cache", "commontalk", "snapshot"))
+# "on": full (non-search) clustering jobs read the shared snapshot; "off": per-job export
+CLUSTER_SNAPSHOT = os.getenv("CLUSTER_SNAPSHOT", "on").lower()
+# Jobs use the snapshot as-is if it was updated this recently; otherwise they append new points first
+SNAPSHOT_MAX_AGE = float(os.getenv("CLUSTER_SNAPSHOT_MAX_AGE", "300"))
+# point_ids this far below the watermark are re-checked on refresh, for transactions that committed late
+SNAPSHOT_LOOKBACK = int(os.getenv("CLUSTER_SNAPSHOT_LOOKBACK", "10000"))
+KEEP_VERSIONS = 2
+
+# Sidecar columns, one file each, row-aligned with the fp16 matrix. -1 marks a missing value.
+# member_id and party_id are VARCHAR ids, stored as int32 codes (see CODED_COLUMNS).
+COLUMNS = {
+    "point_id": np.dtype(np.int64),
+    "date": np.dtype("datetime64[D]"),
+    "house": np.dtype(np.int8),
+    "member_id": np.dtype(np.int32),
+    "party_id": np.dtype(np.int32),
+}
+HOUSE_CODES = {"Commons": 0, "Lords": 1}
+# Id -> code dictionaries, kept in the manifest and extended as new ids are appended
+CODED_COLUMNS = ("member_id", "party_id")
+X_FILE = "X.f16"
+
+_ROWS_SQL = """
+    SELECT p.point_id, d.date, d.house, c.member_id, m.latest_party_membership, p.emb256_f16
+    FROM point p
+    JOIN contribution c ON p.contribution_item_id = c.item_id
+    JOIN debate d       ON c.debate_ext_id = d.ext_id
+    LEFT JOIN member m  ON m.member_id = c.member_id
+    WHERE p.emb256_f16 IS NOT NULL
+      AND p.point_id > %s
+"""
+_COUNT_SQL = """
+    SELECT count(*)
+    FROM point p
+    JOIN contribution c ON p.contribution_item_id = c.item_id
+    JOIN debate d       ON c.debate_ext_id = d.ext_id
+    WHERE p.emb256_f16 IS NOT NULL
+      AND p.point_id <= %s
+"""
+
+
+# =========================
+# Manifest & locking
+# =========================
+
+def _version_dir(root: str, version: int) -> str:
+    return os.path.join(root, f"v{version}")
+
+
+def read_manifest(root: str = SNAPSHOT_DIR) -> Optional[Dict]:
+    try:
+        with open(os.path.join(root, "manifest.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_manifest(root: str, manifest: Dict) -> None:
+    """ Atomic: readers see either the old or the new row count, never a partial write. """
+    path = os.path.join(root, "manifest.json")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _writer_lock(root: str, blocking: bool = True):
+    """ One writer (refresh, rebuild or append) at a time across processes. Yields False if busy and not blocking. """
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".lock"), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# =========================
+# Reading
+# =========================
+
+class Snapshot:
+    """
+    Read-only view of one snapshot version, memory-mapped so every process shares the
+    same pages. Holds a shared lock on its version directory until close(), so an old
+    version is never garbage-collected under a running job.
+    """
+
+    def __init__(self, root: str, manifest: Dict):
+        if "codes" not in manifest:
+            raise ValueError("Snapshot predates id codes; rebuild it (python -m modules.cluster.snapshot --rebuild)")
+        self.codes = manifest["codes"]
+        self.version = manifest["version"]
+        self.n = manifest["n"]
+        self.dims = manifest["dims"]
+        self.dir = _version_dir(root, self.version)
+        self._lock = open(os.path.join(self.dir, ".readers"), "a")
+        fcntl.flock(self._lock, fcntl.LOCK_SH)
+        self.fp16_path = os.path.join(self.dir, X_FILE)
+        self.ids_path = os.path.join(self.dir, "point_id.dat")
+        self.columns = {
+            name: np.memmap(os.path.join(self.dir, f"{name}.dat"), dtype=dtype, mode="r", shape=(self.n,))
+            if self.n else np.empty(0, dtype=dtype)
+            for name, dtype in COLUMNS.items()
+        }
+
+    def mask(self, filters: Dict) -> np.ndarray:
+        """ The store filters (house, start_date, end_date, member_ids) as one boolean mask. """
+        cols = self.columns
+        m = cols["member_id"] >= 0  # c.member_id IS NOT NULL
+        if filters.get("house"):
+            m &= cols["house"] == HOUSE_CODES.get(filters["house"], -1)
+        if filters.get("start_date"):
+            m &= cols["date"] >= np.datetime64(str(filters["start_date"])[:10], "D")
+        if filters.get("end_date"):
+            m &= cols["date"] <= np.datetime64(str(filters["end_date"])[:10], "D")
+        if filters.get("member_ids"):
+            # Ids the snapshot has never seen match nothing
+            codes = [self.codes["member_id"][str(m)] for m in filters["member_ids"] if str(m) in self.codes["member_id"]]
+            m &= np.isin(cols["member_id"], np.asarray(codes, dtype=np.int32))
+        return m
+
+    def select(self, filters: Dict) -> np.ndarray:
+        """ Row indices (into the snapshot's memmaps) of the points matching `filters`. """
+        return np.flatnonzero(self.mask(filters)).astype(np.int64)
+
+    def scratch(self) -> Dict:
+        """ config["scratch"] for the clustering code, pointing at the snapshot's files. """
+        return {"ids_path": self.ids_path, "fp16_path": self.fp16_path, "dims": self.dims, "N": self.n}
+
+    def close(self) -> None:
+        fcntl.flock(self._lock, fcntl.LOCK_UN)
+        self._lock.close()
+
+
+# =========================
+# Writing
+# =========================
+
+def _fetch_batches(conn, after_id: int) -> Iterator[List[Tuple]]:
+    with conn.cursor(name="snapshot_stream") as cur:
+        cur.itersize = FETCH_BATCH
+        cur.execute(_ROWS_SQL, (after_id,))
+        for rows in iter(lambda: cur.fetchmany(FETCH_BATCH), []):
+            yield rows
+
+
+def _encode(values: Iterator, codes: Dict[str, int]) -> np.ndarray:
+    """ VARCHAR ids -> int32 codes, adding unseen ids to `codes`; None -> -1. """
+    return np.fromiter((-1 if v is None else codes.setdefault(str(v), len(codes)) for v in values), dtype=np.int32)
+
+
+def _decode(rows: List[Tuple], dims: int, codes: Dict[str, Dict[str, int]]) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """ One fetched batch -> (sidecar arrays, fp16 matrix), decoded a batch at a time. """
+    cols = {
+        "point_id": np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)),
+        "date": np.array([r[1] for r in rows], dtype="datetime64[D]"),
+        "house": np.fromiter((HOUSE_CODES.get(r[2], -1) for r in rows), dtype=np.int8, count=len(rows)),
+        "member_id": _encode((r[3] for r in rows), codes["member_id"]),
+        "party_id": _encode((r[4] for r in rows), codes["party_id"]),
+    }
+    payload = b"".join(r[5] for r in rows)
+    if len(payload) != len(rows) * dims * 2:
+        raise ValueError(f"emb256_f16 payloads in batch are not all {dims * 2} bytes")
+    return cols, np.frombuffer(payload, dtype=np.float16).reshape(len(rows), dims)
+
+
+def _truncate_to(vdir: str, n: int, dims: int) -> None:
+    """ Drops rows past the manifest count, e.g. left by a refresh that died before publishing. """
+    for name, dtype in COLUMNS.items():
+        path = os.path.join(vdir, f"{name}.dat")
+        with open(path, "ab") as f:
+            f.truncate(n * dtype.itemsize)
+    with open(os.path.join(vdir, X_FILE), "ab") as f:
+        f.truncate(n * dims * 2)
+
+
+def _append(vdir: str, cols: Dict[str, np.ndarray], X: np.ndarray) -> None:
+    for name, dtype in COLUMNS.items():
+        with open(os.path.join(vdir, f"{name}.dat"), "ab") as f:
+            f.write(np.ascontiguousarray(cols[name], dtype=dtype).tobytes())
+    with open(os.path.join(vdir, X_FILE), "ab") as f:
+        f.write(np.ascontiguousarray(X).tobytes())
+
+
+def _append_new_points(conn, vdir: str, manifest: Dict) -> int:
+    """
+    Appends points above `watermark - SNAPSHOT_LOOKBACK` that the snapshot doesn't hold yet.
+    Updates manifest n/dims/watermark in place (unpublished). Returns rows appended.
+    """
+    after = max(manifest["watermark"] - SNAPSHOT_LOOKBACK, 0) if manifest["n"] else 0
+    recent = np.empty(0, dtype=np.int64)
+    if manifest["n"]:
+        ids = np.memmap(os.path.join(vdir, "point_id.dat"), dtype=np.int64, mode="r", shape=(manifest["n"],))
+        recent = np.asarray(ids[ids > after])
+        del ids
+    appended = 0
+    for rows in _fetch_batches(conn, after):
+        if manifest["dims"] is None:
+            manifest["dims"] = len(rows[0][5]) // 2
+        cols, X = _decode(rows, manifest["dims"], manifest["codes"])
+        new = ~np.isin(cols["point_id"], recent)
+        if not new.all():
+            cols = {k: v[new] for k, v in cols.items()}
+            X = X[new]
+        if len(X):
+            _append(vdir, cols, X)
+            manifest["n"] += len(X)
+            manifest["watermark"] = max(manifest["watermark"], int(cols["point_id"].max()))
+            appended += len(X)
+    return appended
+
+
+def _in_sync(conn, manifest: Dict) -> bool:
+    """ False if points the snapshot holds were deleted (e.g. a revised debate was re-ingested). """
+    with conn.cursor() as cur:
+        cur.execute(_COUNT_SQL, (manifest["watermark"],))
+        count = cur.fetchone()[0]
+    return count == manifest["n"]
+
+
+def _gc(root: str, current: int) -> None:
+    """ Deletes old versions beyond KEEP_VERSIONS that no reader holds open. """
+    versions = sorted(int(d[1:]) for d in os.listdir(root) if d.startswith("v") and d[1:].isdigit())
+    for version in versions[:-KEEP_VERSIONS]:
+        if version == current:
+            continue
+        vdir = _version_dir(root, version)
+        try:
+            with open(os.path.join(vdir, ".readers"), "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                shutil.rmtree(vdir)
+        except BlockingIOError:
+            pass  # still in use; try again next time
+        except OSError as e:
+            logger.warning(f"Could not remove snapshot version {version}: {e}")
+
+
+def rebuild_snapshot(conn, root: str = SNAPSHOT_DIR) -> Dict:
+    """ Writes a complete new version from the database and publishes it. """
+    with _writer_lock(root):
+        return _rebuild(conn, root)
+
+
+def _rebuild(conn, root: str) -> Dict:
+    previous = read_manifest(root)
+    version = (previous["version"] + 1) if previous else 1
+    vdir = _version_dir(root, version)
+    shutil.rmtree(vdir, ignore_errors=True)
+    os.makedirs(vdir)
+    manifest = {"version": version, "n": 0, "dims": None, "watermark": 0,
+                "houses": HOUSE_CODES, "codes": {name: {} for name in CODED_COLUMNS}, "created_at": time.time()}
+    t0 = time.perf_counter()
+    _append_new_points(conn, vdir, manifest)
+    manifest["refreshed_at"] = time.time()
+    _write_manifest(root, manifest)
+    logger.info(f"Built snapshot v{version}: {manifest['n']} points in {time.perf_counter() - t0:.1f}s")
+    _gc(root, version)
+    return manifest
+
+
+def refresh_snapshot(conn, root: str = SNAPSHOT_DIR) -> Dict:
+    """
+    Brings the snapshot up to date: appends new points to the current version, or builds
+    a new version if there is none or points it holds have since been deleted.
+    """
+    with _writer_lock(root):
+        manifest = read_manifest(root)
+        if manifest is None or manifest["n"] == 0 or "codes" not in manifest:
+            return _rebuild(conn, root)
+        vdir = _version_dir(root, manifest["version"])
+        _truncate_to(vdir, manifest["n"], manifest["dims"])
+        appended = _append_new_points(conn, vdir, manifest)
+        if not _in_sync(conn, manifest):
+            logger.info(f"Snapshot v{manifest['version']} holds deleted points; rebuilding")
+            return _rebuild(conn, root)
+        manifest["refreshed_at"] = time.time()
+        _write_manifest(root, manifest)
+        logger.info(f"Snapshot v{manifest['version']}: appended {appended} points ({manifest['n']} total)")
+        return manifest
+
+
+def _latest_point_id(conn) -> int:
+    """ One primary-key index probe. """
+    with conn.cursor() as cur:
+        cur.execute("SELECT max(point_id) FROM point")
+        return cur.fetchone()[0] or 0
+
+
+def append_snapshot(conn, root: str = SNAPSHOT_DIR) -> Optional[Dict]:
+    """
+    The in-job top-up: appends points above the watermark (a point_id range scan) and nothing
+    else - deletions are only detected by refresh_snapshot, run out of band (jobs skip deleted
+    points when saving, see save_cluster_ids). Returns None
+    without waiting if another writer holds the lock.
+    """
+    with _writer_lock(root, blocking=False) as locked:
+        if not locked:
+            return None
+        manifest = read_manifest(root)
+        if manifest is None or "codes" not in manifest:
+            return manifest
+        vdir = _version_dir(root, manifest["version"])
+        _truncate_to(vdir, manifest["n"], manifest["dims"])
+        appended = _append_new_points(conn, vdir, manifest)
+        manifest["appended_at"] = time.time()
+        _write_manifest(root, manifest)
+        logger.info(f"Snapshot v{manifest['version']}: appended {appended} points ({manifest['n']} total)")
+        return manifest
+
+
+def open_snapshot(conn, max_age: float = SNAPSHOT_MAX_AGE, root: str = SNAPSHOT_DIR) -> Snapshot:
+    """
+    The current snapshot, as the manifest describes it. If it is older than `max_age` seconds
+    and the database holds newer points, those are appended first. Building, rebuilding and
+    the deletion check are left to the CLI (cron); until then the snapshot may still hold
+    deleted points, which save_cluster_ids skips. Caller must close() it.
+    """
+    manifest = read_manifest(root)
+    if manifest is None:
+        raise FileNotFoundError(f"No snapshot in {root}; build one with python -m modules.cluster.snapshot")
+    updated_at = max(manifest.get("refreshed_at", 0), manifest.get("appended_at", 0))
+    if time.time() - updated_at > max_age and _latest_point_id(conn) > manifest["watermark"]:
+        manifest = append_snapshot(conn, root) or manifest
+    return Snapshot(root, manifest)
+
+
+def main():
+    from ..utils.database_utils import get_db_connection
+    parser = argparse.ArgumentParser(description="Refresh (or rebuild) the shared clustering snapshot.")
+    parser.add_argument("--rebuild", action="store_true", help="write a fresh version instead of appending")
+    args = parser.parse_args()
+    conn = get_db_connection()
+    try:
+        manifest = rebuild_snapshot(conn) if args.rebuild else refresh_snapshot(conn)
+    finally:
+        conn.close()
+    print(f"Snapshot v{manifest['version']}: {manifest['n']} points, {manifest['dims']} dims, "
+          f"watermark point_id {manifest['watermark']}")
+
+
+if __name__ == "__main__":
+    main()
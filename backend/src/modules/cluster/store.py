@@ -1,6 +1,9 @@
 # modules/cluster/store.py
+import multiprocessing
 import os
+import struct
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, Tuple, List, Optional
 
 import numpy as np
@@ -8,6 +11,18 @@ from psycopg2 import sql
 from modules.points.embed import embed
 
 TMP_DIR = tempfile.gettempdir()
+# "copy": binary COPY TO STDOUT decoded straight into the memmaps; "cursor": batched named cursor
+STORE_BUILD_METHOD = os.getenv("STORE_BUILD_METHOD", "copy").lower()
+# Rows per fetch on the cursor path
+FETCH_BATCH = int(os.getenv("STORE_FETCH_BATCH", "20000"))
+# Bytes of COPY data buffered before a batch is decoded
+COPY_BUFFER_BYTES = 8 << 20
+# Full exports of at least STORE_SHARD_MIN_ROWS points are split into this many point_id
+# ranges, each streamed by its own process and connection
+STORE_SHARDS = int(os.getenv("STORE_SHARDS", "4"))
+STORE_SHARD_MIN_ROWS = int(os.getenv("STORE_SHARD_MIN_ROWS", "200000"))
+# Processes exporting shards at once; further shards wait for a free one
+STORE_SHARD_WORKERS = int(os.getenv("STORE_SHARD_WORKERS", str(min(os.cpu_count() or 1, 8))))
 
 
 # =========================
@@ -89,6 +104,248 @@ def count_points(conn, filters: Dict) -> int:
         return cur.fetchone()[0] or 0
 
 
+# =========================
+# Batch decoding
+# =========================
+
+class _StoreWriter:
+    """
+    Owns the ids/fp16 memmaps for one store. Rows are appended a whole batch at a time;
+    anything beyond `capacity` (rows inserted after the COUNT) is dropped, and close()
+    truncates the files to the rows actually written.
+
+    With `offset`, writes `capacity` rows into that slice of existing, presized files
+    instead (one shard of a sharded export) and never truncates.
+    """
+
+    def __init__(self, ids_path: str, fp16_path: str, capacity: int, dims: int, offset: Optional[int] = None):
+        self.ids_path, self.fp16_path = ids_path, fp16_path
+        self.capacity, self.dims = capacity, dims
+        self.sliced = offset is not None
+        if self.sliced:
+            self.ids_mm = np.memmap(ids_path, dtype=np.int64, mode="r+", shape=(capacity,), offset=offset * 8)
+            self.Xf16_mm = np.memmap(fp16_path, dtype=np.float16, mode="r+", shape=(capacity, dims),
+                                     offset=offset * dims * 2)
+        else:
+            self.ids_mm = np.memmap(ids_path, dtype=np.int64, mode="w+", shape=(capacity,))
+            self.Xf16_mm = np.memmap(fp16_path, dtype=np.float16, mode="w+", shape=(capacity, dims))
+        self.n = 0
+
+    def write(self, ids: np.ndarray, X: np.ndarray) -> None:
+        m = min(len(ids), self.capacity - self.n)
+        self.ids_mm[self.n:self.n + m] = ids[:m]
+        self.Xf16_mm[self.n:self.n + m] = X[:m]
+        self.n += m
+
+    def write_rows(self, rows: List[Tuple[int, bytes]]) -> None:
+        """ Decodes a fetched batch of (point_id, emb256_f16) with one join and one frombuffer. """
+        if not rows:
+            return
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        payload = b"".join(r[1] for r in rows)
+        if len(payload) != len(rows) * self.dims * 2:
+            raise ValueError(f"emb256_f16 payloads in batch are not all {self.dims * 2} bytes")
+        self.write(ids, np.frombuffer(payload, dtype=np.float16).reshape(len(rows), self.dims))
+
+    def close(self) -> int:
+        self.ids_mm.flush(); self.Xf16_mm.flush()
+        del self.ids_mm; del self.Xf16_mm  # close memmaps before truncating
+        if self.n < self.capacity and not self.sliced:
+            with open(self.ids_path, "r+b") as f:
+                f.truncate(self.n * np.dtype(np.int64).itemsize)
+            with open(self.fp16_path, "r+b") as f:
+                f.truncate(self.n * self.dims * np.dtype(np.float16).itemsize)
+        return self.n
+
+
+class _BinaryCopySink:
+    """
+    File-like target for `COPY (SELECT point_id, emb256_f16 ...) TO STDOUT WITH (FORMAT binary)`.
+    Every tuple has the same size (2-byte field count, then length-prefixed int8 and bytea), so
+    buffered tuples are decoded in bulk through a structured dtype rather than parsed one by one.
+    """
+    HEADER_LEN = 19  # 11-byte signature, flags, header-extension length (empty)
+
+    def __init__(self, writer: _StoreWriter):
+        self.writer = writer
+        self.row_dtype = np.dtype([
+            ("n_fields", ">i2"),
+            ("id_len", ">i4"), ("point_id", ">i8"),
+            ("emb_len", ">i4"), ("emb", "<f2", (writer.dims,)),
+        ])
+        self.buf = bytearray()
+        self.header_seen = False
+
+    def write(self, data) -> None:
+        self.buf += data
+        if len(self.buf) >= COPY_BUFFER_BYTES:
+            self._drain()
+
+    def _drain(self) -> None:
+        start = 0
+        if not self.header_seen:
+            if len(self.buf) < self.HEADER_LEN:
+                return
+            if bytes(self.buf[:11]) != b"PGCOPY\n\xff\r\n\x00":
+                raise ValueError("Unexpected COPY binary signature")
+            ext_len = struct.unpack(">i", self.buf[15:19])[0]
+            start = self.HEADER_LEN + ext_len
+            self.header_seen = True
+        k = (len(self.buf) - start) // self.row_dtype.itemsize
+        if k:
+            rows = np.frombuffer(self.buf, dtype=self.row_dtype, count=k, offset=start)
+            if (rows["n_fields"] != 2).any() or (rows["emb_len"] != self.writer.dims * 2).any():
+                raise ValueError(f"emb256_f16 payloads in COPY stream are not all {self.writer.dims * 2} bytes")
+            self.writer.write(rows["point_id"].astype(np.int64), rows["emb"])
+            del rows  # release the view so the buffer can be resized
+            start += k * self.row_dtype.itemsize
+        del self.buf[:start]
+
+    def close(self) -> None:
+        """ Decodes what is left; only the 2-byte trailer may remain. """
+        self._drain()
+        if bytes(self.buf) not in (b"", b"\xff\xff"):
+            raise ValueError(f"Trailing {len(self.buf)} bytes in COPY stream")
+
+
+def _stream_into(conn, q: sql.Composable, params: List, writer: _StoreWriter, method: str, cursor_name: str) -> int:
+    """ Runs the (point_id, emb256_f16) query `q` and writes every row into `writer`. """
+    if method == "copy":
+        with conn.cursor() as cur:
+            select = cur.mogrify(q.as_string(cur), params).decode()
+            sink = _BinaryCopySink(writer)
+            cur.copy_expert(f"COPY ({select}) TO STDOUT WITH (FORMAT binary)", sink)
+            sink.close()
+    elif method == "cursor":
+        with conn.cursor(name=cursor_name) as cur:
+            cur.itersize = FETCH_BATCH
+            cur.execute(q, params)
+            for rows in iter(lambda: cur.fetchmany(FETCH_BATCH), []):
+                writer.write_rows(rows)
+    else:
+        raise ValueError(f"Unknown store build method {method!r}; expected 'copy' or 'cursor'")
+    return writer.n
+
+
+# =========================
+# Sharded export
+# =========================
+
+def _points_query(filters: Dict) -> Tuple[sql.Composable, List]:
+    """ SELECT point_id, emb256_f16 for the full (non-search) store, with filters applied. """
+    where_sql, params = _where_for_filters(filters)
+    base = sql.SQL("""
+        SELECT p.point_id, p.emb256_f16
+        FROM point p
+        JOIN contribution c ON p.contribution_item_id = c.item_id
+        JOIN debate d       ON c.debate_ext_id = d.ext_id
+        WHERE p.emb256_f16 IS NOT NULL
+          AND c.member_id IS NOT NULL
+    """)
+    return (base if where_sql is None else base + sql.SQL(" AND ") + where_sql), params
+
+
+def plan_shards(conn, filters: Dict, shards: int) -> List[Tuple[int, int, int]]:
+    """
+    Splits the filtered points into `shards` point_id ranges of near-equal size.
+    Returns [(lo, hi, count)] in point_id order; lo and hi are inclusive.
+    """
+    q, params = _points_query(filters)
+    plan = sql.SQL("""
+        SELECT min(point_id), max(point_id), count(*)
+        FROM (SELECT s.point_id, ntile(%s) OVER (ORDER BY s.point_id) AS shard FROM ({q}) s) t
+        GROUP BY shard
+        ORDER BY shard
+    """).format(q=q)
+    with conn.cursor() as cur:
+        cur.execute(plan, [shards] + params)
+        return [(lo, hi, n) for lo, hi, n in cur.fetchall()]
+
+
+def _export_shard(filters: Dict, lo: int, hi: int, ids_path: str, fp16_path: str,
+                  offset: int, capacity: int, dims: int, method: str) -> int:
+    """ Worker: streams point_ids [lo, hi] on a new connection into rows [offset, offset + capacity). Returns rows written. """
+    from ..utils.database_utils import get_db_connection
+    conn = get_db_connection()
+    try:
+        q, params = _points_query(filters)
+        q = q + sql.SQL(" AND p.point_id BETWEEN %s AND %s ORDER BY p.point_id")
+        writer = _StoreWriter(ids_path, fp16_path, capacity, dims, offset=offset)
+        try:
+            _stream_into(conn, q, params + [lo, hi], writer, method, f"shard_stream_{offset}")
+        finally:
+            writer.close()
+        return writer.n
+    finally:
+        conn.close()
+
+
+def _compact(ids_path: str, fp16_path: str, dims: int, slices: List[Tuple[int, int, int]]) -> int:
+    """
+    Final pass over a sharded store: shards that came back short (points deleted between
+    planning and export) leave gaps, so later slices are moved down over them and the
+    files truncated. `slices` is [(offset, capacity, written)]. Returns the final row count.
+    """
+    total = sum(capacity for _, capacity, _ in slices)
+    if all(written == capacity for _, capacity, written in slices):
+        return total
+    ids_mm = np.memmap(ids_path, dtype=np.int64, mode="r+", shape=(total,))
+    Xf16_mm = np.memmap(fp16_path, dtype=np.float16, mode="r+", shape=(total, dims))
+    dest = 0
+    for offset, _, written in slices:
+        if dest != offset:
+            ids_mm[dest:dest + written] = ids_mm[offset:offset + written]
+            Xf16_mm[dest:dest + written] = Xf16_mm[offset:offset + written]
+        dest += written
+    ids_mm.flush(); Xf16_mm.flush()
+    del ids_mm; del Xf16_mm
+    with open(ids_path, "r+b") as f:
+        f.truncate(dest * np.dtype(np.int64).itemsize)
+    with open(fp16_path, "r+b") as f:
+        f.truncate(dest * dims * np.dtype(np.float16).itemsize)
+    return dest
+
+
+def build_local_fp16_store_sharded(
+    conn,
+    filters: Dict,
+    job_id: int,
+    dims: int,
+    shards: int = STORE_SHARDS,
+    method: str = STORE_BUILD_METHOD,
+) -> Tuple[str, str, int, int]:
+    """
+    Same output as build_local_fp16_store, but the point_id space is split into `shards`
+    near-equal ranges (plan_shards) whose counts give each range a fixed slice of the
+    presized memmaps. Each range is streamed in point_id order by its own process and
+    connection straight into its slice; a final pass closes any gaps. The store ends up
+    sorted by point_id.
+    """
+    plan = plan_shards(conn, filters, shards)
+    N = sum(n for _, _, n in plan)
+    if N == 0:
+        return _empty_store(job_id)
+
+    ids_path, fp16_path = paths_for_job(job_id)
+    with open(ids_path, "wb") as f:
+        f.truncate(N * np.dtype(np.int64).itemsize)
+    with open(fp16_path, "wb") as f:
+        f.truncate(N * dims * np.dtype(np.float16).itemsize)
+
+    offsets = np.concatenate([[0], np.cumsum([n for _, _, n in plan])[:-1]]).tolist()
+    # spawn, not fork: the parent holds an open connection and possibly BLAS threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, min(STORE_SHARD_WORKERS, len(plan))), mp_context=context) as pool:
+        futures = [
+            pool.submit(_export_shard, filters, lo, hi, ids_path, fp16_path, offset, n, dims, method)
+            for (lo, hi, n), offset in zip(plan, offsets)
+        ]
+        written = [f.result() for f in futures]
+
+    N = _compact(ids_path, fp16_path, dims, [(o, n, w) for (_, _, n), o, w in zip(plan, offsets, written)])
+    return ids_path, fp16_path, N, dims
+
+
 # =========================
 # Builders (streaming)
 # =========================
@@ -97,6 +354,8 @@ def build_local_fp16_store(
     conn,
     filters: Dict,
     job_id: int,
+    method: str = STORE_BUILD_METHOD,
+    shards: int = STORE_SHARDS,
 ) -> Tuple[str, str, int, int]:
     """
     Stream all matching rows, writing:
@@ -104,7 +363,9 @@ def build_local_fp16_store(
       Xfp16_.dat : float16 memmap shape (N, inferred_dims)
 
     Uses p.emb256_f16 (fp16 bytea) only. No dims argument, no client truncation.
-    Pre-sizes exactly via COUNT, then streams via server-side cursor.
+    Pre-sizes exactly via COUNT, then streams either a binary COPY (method="copy") or
+    large cursor batches (method="cursor"), decoding a whole batch at a time. Stores of
+    STORE_SHARD_MIN_ROWS or more are exported in parallel when `shards` > 1.
     """
     # Infer dims from a sample row (fp16 -> 2 bytes per dim)
     with conn.cursor() as cur0:
@@ -126,38 +387,17 @@ def build_local_fp16_store(
     N = count_points(conn, filters)
     if N == 0:
         return _empty_store(job_id)
+    if shards > 1 and N >= STORE_SHARD_MIN_ROWS:
+        return build_local_fp16_store_sharded(conn, filters, job_id, dims, shards=shards, method=method)
 
     ids_path, fp16_path = paths_for_job(job_id)
-    ids_mm = np.memmap(ids_path, dtype=np.int64, mode="w+", shape=(N,))
-    Xf16_mm = np.memmap(fp16_path, dtype=np.float16, mode="w+", shape=(N, dims))
-
-    BATCH = 100
-    with conn.cursor(name="points_stream") as cur:
-        where_sql, params = _where_for_filters(filters)
-        base = sql.SQL("""
-            SELECT p.point_id, p.emb256_f16
-            FROM point p
-            JOIN contribution c ON p.contribution_item_id = c.item_id
-            JOIN debate d       ON c.debate_ext_id = d.ext_id
-            WHERE p.emb256_f16 IS NOT NULL
-              AND c.member_id IS NOT NULL
-        """)
-        q = base if where_sql is None else base + sql.SQL(" AND ") + where_sql
-
-        cur.itersize = BATCH
-        cur.execute(q, params)
-
-        i = 0
-        for rows in iter(lambda: cur.fetchmany(BATCH), []):
-            if not rows:
-                break
-            m = len(rows)
-            ids_mm[i:i + m] = [r[0] for r in rows]
-            for j in range(m):
-                Xf16_mm[i + j] = np.frombuffer(rows[j][1], dtype=np.float16, count=dims)
-            i += m
+    writer = _StoreWriter(ids_path, fp16_path, N, dims)
+    q, params = _points_query(filters)
 
-    ids_mm.flush(); Xf16_mm.flush()
+    try:
+        _stream_into(conn, q, params, writer, method, "points_stream")
+    finally:
+        N = writer.close()
     return ids_path, fp16_path, N, dims
 
 
@@ -167,22 +407,29 @@ def build_local_fp16_store_search(
     job_id: int,
     *,
     search_limit: int,
+    method: str = STORE_BUILD_METHOD,
 ) -> Tuple[str, str, int, int]:
     """
     Rank by full pgvector (p.point_embedding <-> q), limit to `search_limit`,
     write truncated fp16 bytes from p.emb256_f16.
 
     Streaming plan:
-      - Use a server-side cursor with ORDER BY ... LIMIT K
-      - Fetch the first row to infer dims
+      - Infer dims from a sample row
       - Pre-allocate memmaps for K rows (upper bound)
-      - Stream-insert batches
+      - Stream the ORDER BY ... LIMIT K query (binary COPY or cursor batches)
       - Truncate files to K_eff at the end
     """
     query_text = (filters or {}).get("query")
     if not query_text or search_limit <= 0:
         return _empty_store(job_id)
 
+    with conn.cursor() as cur0:
+        cur0.execute("SELECT octet_length(emb256_f16) FROM point WHERE emb256_f16 IS NOT NULL LIMIT 1")
+        row = cur0.fetchone()
+    if not row or not row[0]:
+        return _empty_store(job_id)
+    dims = row[0] // 2
+
     qvec = list(map(float, embed(query_text)))
 
     where_sql, params = _where_for_filters(filters)
@@ -200,50 +447,11 @@ def build_local_fp16_store_search(
     params = params + [qvec, search_limit]
 
     ids_path, fp16_path = paths_for_job(job_id)
-
-    BATCH = min(100, max(10, search_limit))
-    with conn.cursor(name="search_stream") as cur:
-        cur.itersize = BATCH
-        cur.execute(q, params)
-
-        # First row: infer dims, allocate files
-        first = cur.fetchone()
-        if not first:
-            return _empty_store(job_id)
-        first_pid, first_bytes = first
-        dims = len(first_bytes) // 2
-
-        # Pre-allocate to the LIMIT upper bound, then shrink
-        ids_mm = np.memmap(ids_path, dtype=np.int64, mode="w+", shape=(search_limit,))
-        Xf16_mm = np.memmap(fp16_path, dtype=np.float16, mode="w+", shape=(search_limit, dims))
-
-        # Write the first row
-        i = 0
-        ids_mm[i] = int(first_pid)
-        Xf16_mm[i] = np.frombuffer(first_bytes, dtype=np.float16, count=dims)
-        i += 1
-
-        # Stream remaining rows in batches
-        for rows in iter(lambda: cur.fetchmany(BATCH), []):
-            if not rows:
-                break
-            m = len(rows)
-            for j in range(m):
-                pid, f16_bytes = rows[j]
-                ids_mm[i + j] = int(pid)
-                Xf16_mm[i + j] = np.frombuffer(f16_bytes, dtype=np.float16, count=dims)
-            i += m
-
-    # Flush and truncate to the effective size
-    ids_mm.flush(); Xf16_mm.flush()
-    del ids_mm; del Xf16_mm  # close memmaps before truncating
-
-    int64_size = np.dtype(np.int64).itemsize
-    f16_size = np.dtype(np.float16).itemsize
-
-    with open(ids_path, "r+b") as f:
-        f.truncate(i * int64_size)
-    with open(fp16_path, "r+b") as f:
-        f.truncate(i * dims * f16_size)
-
-    return ids_path, fp16_path, i, dims
+    writer = _StoreWriter(ids_path, fp16_path, search_limit, dims)
+    try:
+        _stream_into(conn, q, params, writer, method, "search_stream")
+    finally:
+        n = writer.close()
+    if n == 0:
+        return _empty_store(job_id)
+    return ids_path, fp16_path, n, dims
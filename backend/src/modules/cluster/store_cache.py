@@ -0,0 +1,192 @@
+# modules/cluster/store_cache.py
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from ..utils.cache_utils import cache_key
+from .store import TMP_DIR
+
+logger = logging.getLogger(__name__)
+
+# "on": scratch stores are kept and shared between jobs with the same filters; "off": per-job
+STORE_CACHE = os.getenv("STORE_CACHE", "on").lower()
+STORE_CACHE_DIR = os.getenv("STORE_CACHE_DIR", os.path.join(TMP_DIR, "commontalk_store_cache"))
+# Disk budget; least-recently-used stores nobody is reading are evicted beyond it
+STORE_CACHE_MAX_BYTES = int(os.getenv("STORE_CACHE_MAX_BYTES", str(4 << 30)))
+# Stores older than this are rebuilt, so new points show up
+STORE_CACHE_TTL = float(os.getenv("STORE_CACHE_TTL", "3600"))
+
+
+def store_spec(filters: Dict, search_limit: int) -> Dict:
+    """
+    Canonical identity of the store a job needs. Search stores are keyed without their
+    limit: results are ordered by distance, so a store built with a larger limit holds
+    the answer to a smaller one as a prefix.
+    """
+    member_ids = sorted({str(m).strip() for m in filters.get("member_ids") or []})
+    canonical = {
+        "house": filters.get("house") or None,
+        "start_date": str(filters["start_date"])[:10] if filters.get("start_date") else None,
+        "end_date": str(filters["end_date"])[:10] if filters.get("end_date") else None,
+        "member_ids": member_ids or None,
+    }
+    query = " ".join((filters.get("query") or "").split())
+    if query:
+        canonical["query"] = query
+        return {"key": cache_key("search", canonical), "limit": int(search_limit)}
+    return {"key": cache_key("full", canonical), "limit": None}
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+class StoreCache:
+    """
+    Scratch stores (ids/Xfp16 memmap pairs) shared between clustering jobs. An index file,
+    guarded by an flock, records each store's size, last use and the pids currently
+    reading it; stores with live readers are never evicted, and readers from crashed
+    processes are dropped when their pid is gone.
+    """
+
+    def __init__(self, root: str = STORE_CACHE_DIR, max_bytes: int = STORE_CACHE_MAX_BYTES, ttl: float = STORE_CACHE_TTL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, "index.json")
+
+    @contextmanager
+    def _index(self):
+        """ Locked read-modify-write of the index. """
+        with open(os.path.join(self.root, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.index_path) as f:
+                    index = json.load(f)
+            except (FileNotFoundError, ValueError):
+                index = {}
+            for entry in index.values():
+                entry["readers"] = [pid for pid in entry["readers"] if _alive(pid)]
+            yield index
+            tmp = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp, self.index_path)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _usable(self, entry: Dict, spec: Dict) -> bool:
+        if time.time() - entry["created_at"] > self.ttl:
+            return False
+        if spec["limit"] is None:
+            return True
+        # A store that came back short of its limit already holds every match
+        return entry["limit"] >= spec["limit"] or entry["N"] < entry["limit"]
+
+    def _view(self, entry: Dict, spec: Dict) -> Dict:
+        n = entry["N"] if spec["limit"] is None else min(entry["N"], spec["limit"])
+        return {"ids_path": entry["ids_path"], "fp16_path": entry["fp16_path"], "N": n, "dims": entry["dims"]}
+
+    def acquire(self, spec: Dict) -> Optional[Dict]:
+        """ A cached store satisfying `spec`, registered as read by this process; None on a miss. """
+        with self._index() as index:
+            entry = index.get(spec["key"])
+            if entry is None or not self._usable(entry, spec):
+                return None
+            entry["readers"].append(os.getpid())
+            entry["last_used"] = time.time()
+            return self._view(entry, spec)
+
+    def adopt(self, spec: Dict, ids_path: str, fp16_path: str, N: int, dims: int) -> Optional[Dict]:
+        """
+        Moves a freshly built store into the cache and registers this process as a reader.
+        If another job cached an equivalent store meanwhile, that one is used and ours dropped.
+        Returns None, leaving the store where it is for this job alone, if it can't be moved
+        (e.g. STORE_CACHE_DIR is on another filesystem, where a rename would mean a copy).
+        """
+        with self._index() as index:
+            entry = index.get(spec["key"])
+            if entry is not None and self._usable(entry, spec):
+                for p in (ids_path, fp16_path):
+                    _remove(p)
+            else:
+                stamp = f"{spec['key'][:16]}_{os.getpid()}_{int(time.time() * 1000)}"
+                cached_ids = os.path.join(self.root, f"ids_{stamp}.dat")
+                cached_fp16 = os.path.join(self.root, f"Xfp16_{stamp}.dat")
+                try:
+                    os.replace(ids_path, cached_ids)
+                    try:
+                        os.replace(fp16_path, cached_fp16)
+                    except OSError:
+                        os.replace(cached_ids, ids_path)
+                        raise
+                except OSError as e:
+                    logger.warning(f"Store not cached, using it uncached: {e}")
+                    return None
+                if entry is not None:
+                    # Stale but maybe still being read: park it until its readers finish
+                    entry["created_at"] = 0
+                    index[f"{spec['key']}:retired:{stamp}"] = entry
+                entry = {"ids_path": cached_ids, "fp16_path": cached_fp16, "N": N, "dims": dims,
+                         "limit": spec["limit"], "bytes": N * (8 + 2 * dims), "created_at": time.time(),
+                         "last_used": time.time(), "readers": []}
+                index[spec["key"]] = entry
+            entry["readers"].append(os.getpid())
+            self._evict(index)
+            return self._view(entry, spec)
+
+    def release(self, store: Dict) -> None:
+        """ Unregisters this process as a reader of a store returned by acquire/adopt. """
+        with self._index() as index:
+            for entry in index.values():
+                if entry["ids_path"] == store["ids_path"] and os.getpid() in entry["readers"]:
+                    entry["readers"].remove(os.getpid())
+                    break
+            self._evict(index)
+
+    def _evict(self, index: Dict) -> None:
+        """ Drops expired stores, then least-recently-used ones, skipping any with readers. """
+        total = sum(e["bytes"] for e in index.values())
+        for key, entry in sorted(index.items(), key=lambda kv: kv[1]["last_used"]):
+            if entry["readers"]:
+                continue
+            expired = time.time() - entry["created_at"] > self.ttl
+            if expired or total > self.max_bytes:
+                _remove_entry(entry)
+                del index[key]
+                total -= entry["bytes"]
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _remove_entry(entry: Dict) -> None:
+    _remove(entry["ids_path"])
+    _remove(entry["fp16_path"])
+
+
+_cache: Optional[StoreCache] = None
+
+
+def get_store_cache() -> Optional[StoreCache]:
+    """ The process-wide cache, or None when STORE_CACHE=off. """
+    global _cache
+    if STORE_CACHE == "off":
+        return None
+    if _cache is None:
+        _cache = StoreCache()
+    return _cache
@@ -0,0 +1,178 @@
+# modules/cluster/warm.py
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from .reduce import Projection
+
+logger = logging.getLogger(__name__)
+
+# "on": jobs warm-start from the latest completed job with overlapping filters; "off": random init
+CLUSTER_WARM_START = os.getenv("CLUSTER_WARM_START", "on").lower()
+# A node whose centroid is at least this cosine-similar to its previous match keeps its title/summary
+CLUSTER_LABEL_REUSE_SIMILARITY = float(os.getenv("CLUSTER_LABEL_REUSE_SIMILARITY", "0.98"))
+# Recent completed jobs considered as a warm-start source
+WARM_LOOKBACK_JOBS = 50
+
+# Config keys that shape the tree; a previous job must agree on them to be a warm-start source
+TREE_KEYS = ("n_clusters", "n_clusters_base", "search")
+
+_schema_ready = False
+
+
+def ensure_centroid_schema(conn) -> None:
+    """ Idempotently adds the cluster_centroids table to databases created before it. """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS cluster_centroids (
+                cluster_id INTEGER PRIMARY KEY REFERENCES clusters(cluster_id) ON DELETE CASCADE,
+                job_id BIGINT REFERENCES cluster_jobs(job_id),
+                path TEXT NOT NULL,
+                space TEXT NOT NULL,
+                centroid BYTEA,
+                projection BYTEA
+            );
+            CREATE INDEX IF NOT EXISTS idx_cluster_centroids_job ON cluster_centroids(job_id);
+        """)
+    conn.commit()
+    _schema_ready = True
+
+
+def space_key(scratch: Dict) -> str:
+    """ The vector space a job clusters in: its projection's basis, or the raw stored dims. """
+    if scratch.get("projection_path"):
+        return Projection.load(scratch["projection_path"]).key
+    return f"raw{scratch['dims']}"
+
+
+def child_path(path: str, label: int) -> str:
+    """ A node's position in its tree: "" for the root, then parent labels, e.g. "2/0". """
+    return f"{path}/{label}" if path else str(label)
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> float:
+    return float(a @ b / max(np.linalg.norm(a) * np.linalg.norm(b), 1e-12))
+
+
+class WarmNode:
+    """ One node of a previous job's tree: its centroid, labels and children by k-means label. """
+
+    def __init__(self, cluster_id: int, centroid: Optional[np.ndarray], title: Optional[str], summary: Optional[str]):
+        self.cluster_id = cluster_id
+        self.centroid = centroid
+        self.title = title
+        self.summary = summary
+        self.children: Dict[int, "WarmNode"] = {}
+
+    def init(self) -> Optional[np.ndarray]:
+        """ The children's centroids in label order, to seed this node's split; None unless labels are 0..k-1. """
+        if not self.children or sorted(self.children) != list(range(len(self.children))):
+            return None
+        return np.stack([self.children[j].centroid for j in range(len(self.children))])
+
+    def match(self, centroids: Dict[int, np.ndarray]) -> Dict[int, "WarmNode"]:
+        """ Pairs new children (label -> centroid) with previous ones, one-to-one by cosine similarity. """
+        if not self.children or not centroids:
+            return {}
+        new_labels, old_labels = list(centroids), list(self.children)
+        similarity = np.array([[_cosine(centroids[n], self.children[o].centroid) for o in old_labels] for n in new_labels])
+        rows, cols = linear_sum_assignment(-similarity)
+        return {new_labels[r]: self.children[old_labels[c]] for r, c in zip(rows, cols)}
+
+    def labels_for(self, centroid: Optional[np.ndarray]) -> Optional[Tuple[str, str]]:
+        """ (title, summary) to reuse if `centroid` is close enough to this node's, else None. """
+        if centroid is None or self.centroid is None or not self.title:
+            return None
+        if _cosine(centroid, self.centroid) < CLUSTER_LABEL_REUSE_SIMILARITY:
+            return None
+        return self.title, self.summary
+
+
+def filters_overlap(a: Dict, b: Dict) -> bool:
+    """ Same house, members and query, and date ranges that intersect (open ends overlap everything). """
+    if (a.get("house") or None) != (b.get("house") or None):
+        return False
+    if sorted({str(m).strip() for m in a.get("member_ids") or []}) != sorted({str(m).strip() for m in b.get("member_ids") or []}):
+        return False
+    if " ".join((a.get("query") or "").split()) != " ".join((b.get("query") or "").split()):
+        return False
+    a_start, a_end = str(a.get("start_date") or "")[:10], str(a.get("end_date") or "")[:10]
+    b_start, b_end = str(b.get("start_date") or "")[:10], str(b.get("end_date") or "")[:10]
+    return (not a_start or not b_end or a_start <= b_end) and (not b_start or not a_end or b_start <= a_end)
+
+
+def find_previous_job(conn, config: Dict, filters: Dict, job_id: int) -> Optional[int]:
+    """ The latest completed job with overlapping filters, the same tree shape and saved centroids. """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT j.job_id, j.params
+            FROM cluster_jobs j
+            WHERE j.status = 'complete' AND j.job_id <> %s
+              AND EXISTS (SELECT 1 FROM cluster_centroids cc WHERE cc.job_id = j.job_id)
+            ORDER BY j.job_id DESC
+            LIMIT %s
+        """, (job_id, WARM_LOOKBACK_JOBS))
+        rows = cur.fetchall()
+    for previous_id, params in rows:
+        previous_config, previous_filters = params.get("config") or {}, params.get("filters") or {}
+        if previous_filters.get("member"):
+            previous_filters = {**previous_filters, "member_ids": [previous_filters["member"]]}
+        if all(previous_config.get(k) == config.get(k) for k in TREE_KEYS) and filters_overlap(previous_filters, filters):
+            return previous_id
+    return None
+
+
+def load_previous_tree(conn, job_id: int) -> Tuple[Optional[WarmNode], Optional[str], Optional[Projection]]:
+    """ A job's saved tree as WarmNodes, with the space it was clustered in and its projection, if any. """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT cc.cluster_id, cc.path, cc.space, cc.centroid, cc.projection, c.title, c.summary
+            FROM cluster_centroids cc
+            JOIN clusters c ON c.cluster_id = cc.cluster_id
+            WHERE cc.job_id = %s
+        """, (job_id,))
+        rows = cur.fetchall()
+    nodes: Dict[str, WarmNode] = {}
+    space = projection = None
+    for cluster_id, path, row_space, centroid, projection_bytes, title, summary in rows:
+        vector = np.frombuffer(bytes(centroid), dtype=np.float32) if centroid is not None else None
+        nodes[path] = WarmNode(cluster_id, vector, title, summary)
+        if path == "":
+            space = row_space
+            projection = Projection.from_bytes(bytes(projection_bytes)) if projection_bytes is not None else None
+    for path, node in nodes.items():
+        if path:
+            parent, _, label = path.rpartition("/")
+            if parent in nodes:
+                nodes[parent].children[int(label)] = node
+    return nodes.get(""), space, projection
+
+
+def previous_tree(conn, config: Dict, filters: Dict, job_id: int):
+    """ (root WarmNode, space, projection, previous job_id) to warm-start from, or all None. """
+    if CLUSTER_WARM_START != "on":
+        return None, None, None, None
+    previous_id = find_previous_job(conn, config, filters, job_id)
+    if previous_id is None:
+        return None, None, None, None
+    root, space, projection = load_previous_tree(conn, previous_id)
+    return root, space, projection, previous_id
+
+
+def save_centroid(conn, cluster_id: int, job_id: int, path: str, space: str,
+                  centroid: Optional[np.ndarray] = None, projection: Optional[bytes] = None) -> None:
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO cluster_centroids (cluster_id, job_id, path, space, centroid, projection)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (cluster_id) DO NOTHING
+        """, (cluster_id, job_id, path, space,
+              np.asarray(centroid, dtype=np.float32).tobytes() if centroid is not None else None,
+              projection))
+    conn.commit()
@@ -0,0 +1,205 @@
+# modules/data/bulk.py
+# Imports
+import io
+import time
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+# (table column, source dict key) - mirrors the row-by-row inserts in insert.py
+PARTY_COLUMNS = [
+    ("party_id", "party_id"),
+    ("name", "name"),
+    ("abbreviation", "abbreviation"),
+    ("background_colour", "backgroundColour"),
+    ("foreground_colour", "foregroundColour"),
+    ("is_lords_main_party", "isLordsMainParty"),
+    ("is_lords_spiritual_party", "isLordsSpiritualParty"),
+    ("government_type", "governmentType"),
+    ("is_independent_party", "isIndependentParty"),
+]
+MEMBER_COLUMNS = [
+    ("member_id", "member_id"),
+    ("name_list_as", "nameListAs"),
+    ("name_display_as", "nameDisplayAs"),
+    ("name_full_title", "nameFullTitle"),
+    ("name_address_as", "nameAddressAs"),
+    ("latest_party_membership", "latestParty"),
+    ("latest_house_membership_id", "latestHouseMembership"),
+    ("thumbnail_url", "thumbnailUrl"),
+]
+DEBATE_COLUMNS = [
+    ("ext_id", "ext_id"),
+    ("title", "title"),
+    ("date", "date"),
+    ("house", "house"),
+    ("location", "location"),
+    ("debate_type_id", "debate_type_id"),
+    ("parent_ext_id", "parent_ext_id"),
+    ("content_hash", "content_hash"),
+]
+CONTRIBUTION_COLUMNS = [
+    ("ext_id", "ext_id"),
+    ("item_id", "item_id"),
+    ("contribution_type", "type"),
+    ("debate_ext_id", "debate_section_ext_id"),
+    ("member_id", "member_id"),
+    ("attributed_to", "attributed_to"),
+    ("contribution_value", "value"),
+    ("order_in_section", "order_in_section"),
+    ("timecode", "timecode"),
+    ("hrs_tag", "hrs_tag"),
+]
+
+
+# =========================
+# COPY helpers
+# =========================
+
+def _copy_value(value) -> str:
+    """Encodes a value for COPY ... FROM STDIN text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (str(value)
+            .replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r"))
+
+
+def _copy_buffer(rows: List[Dict], columns: Sequence[Tuple[str, str]]) -> io.StringIO:
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_value(row.get(key)) for _, key in columns))
+        buf.write("\n")
+    buf.seek(0)
+    return buf
+
+
+def _stage(cur, table: str, rows: List[Dict], columns: Sequence[Tuple[str, str]]) -> sql.Identifier:
+    """COPYs rows into a session temp table shaped like `table`, dropped at commit."""
+    staging = sql.Identifier(f"staging_{table}")
+    cur.execute(sql.SQL("CREATE TEMP TABLE IF NOT EXISTS {s} (LIKE {t} INCLUDING DEFAULTS) ON COMMIT DROP")
+                .format(s=staging, t=sql.Identifier(table)))
+    cur.execute(sql.SQL("TRUNCATE {s}").format(s=staging))
+    copy_sql = sql.SQL("COPY {s} ({cols}) FROM STDIN").format(
+        s=staging, cols=sql.SQL(", ").join(sql.Identifier(c) for c, _ in columns))
+    cur.copy_expert(copy_sql.as_string(cur), _copy_buffer(rows, columns))
+    return staging
+
+
+def report_load(table: str, n_rows: int, n_inserted: int, seconds: float, path: str) -> Dict:
+    """Logs and returns throughput for a load, so the bulk and row-by-row paths can be compared."""
+    rate = n_rows / seconds if seconds > 0 else float("inf")
+    logger.info(f"[{path}] {table}: {n_inserted}/{n_rows} rows inserted in {seconds:.2f}s ({rate:,.0f} rows/sec)")
+    return {"table": table, "path": path, "rows": n_rows, "inserted": n_inserted,
+            "seconds": seconds, "rows_per_sec": rate}
+
+
+def _bulk_load(conn, table: str, rows: List[Dict], columns, conflict: str, where: str = "TRUE") -> Dict:
+    """
+    COPY into staging, then INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+    `where` filters staged rows (alias `s`) whose foreign keys would not resolve,
+    matching the row-by-row path where those inserts fail individually.
+    """
+    t0 = time.perf_counter()
+    if not rows:
+        return report_load(table, 0, 0, 0.0, "copy")
+    cols = sql.SQL(", ").join(sql.Identifier(c) for c, _ in columns)
+    with conn.cursor() as cur:
+        staging = _stage(cur, table, rows, columns)
+        cur.execute(sql.SQL("""
+            INSERT INTO {t} ({cols})
+            SELECT {cols} FROM {s} s
+            WHERE {where}
+            ON CONFLICT ({conflict}) DO NOTHING
+        """).format(t=sql.Identifier(table), cols=cols, s=staging,
+                    where=sql.SQL(where), conflict=sql.Identifier(conflict)))
+        inserted = cur.rowcount
+    return report_load(table, len(rows), inserted, time.perf_counter() - t0, "copy")
+
+
+# =========================
+# Per-table loaders
+# =========================
+
+def copy_parties(conn, parties: List[Dict]) -> Dict:
+    return _bulk_load(conn, "party", parties, PARTY_COLUMNS, conflict="party_id")
+
+
+def copy_members(conn, members: List[Dict]) -> Dict:
+    return _bulk_load(conn, "member", members, MEMBER_COLUMNS, conflict="member_id", where="""
+        s.latest_party_membership IS NULL
+        OR EXISTS (SELECT 1 FROM party p WHERE p.party_id = s.latest_party_membership)
+    """)
+
+
+def copy_debates(conn, debates: List[Dict]) -> Dict:
+    """
+    debate.parent_ext_id references debate itself, and a parent may arrive later in the
+    same batch or in a later one. Rows are inserted with a NULL parent first, then parents
+    are linked wherever the referenced debate now exists. Parents not loaded yet are kept
+    in debate_pending_parent and linked by the batch that brings them, rather than failing
+    the row as the row-by-row insert does.
+    """
+    t0 = time.perf_counter()
+    if not debates:
+        return report_load("debate", 0, 0, 0.0, "copy")
+    cols = [c for c, _ in DEBATE_COLUMNS if c != "parent_ext_id"]
+    col_sql = sql.SQL(", ").join(sql.Identifier(c) for c in cols)
+    with conn.cursor() as cur:
+        staging = _stage(cur, "debate", debates, DEBATE_COLUMNS)
+        cur.execute(sql.SQL("""
+            INSERT INTO debate ({cols})
+            SELECT {cols} FROM {s}
+            ON CONFLICT (ext_id) DO NOTHING
+        """).format(cols=col_sql, s=staging))
+        inserted = cur.rowcount
+        cur.execute(sql.SQL("""
+            UPDATE debate d
+               SET parent_ext_id = s.parent_ext_id
+              FROM {s} s
+             WHERE d.ext_id = s.ext_id
+               AND d.parent_ext_id IS NULL
+               AND s.parent_ext_id IS NOT NULL
+               AND EXISTS (SELECT 1 FROM debate p WHERE p.ext_id = s.parent_ext_id)
+        """).format(s=staging))
+        cur.execute(sql.SQL("""
+            INSERT INTO debate_pending_parent (ext_id, parent_ext_id)
+            SELECT s.ext_id, s.parent_ext_id
+              FROM {s} s
+              JOIN debate d ON d.ext_id = s.ext_id
+             WHERE d.parent_ext_id IS NULL
+               AND s.parent_ext_id IS NOT NULL
+            ON CONFLICT (ext_id) DO UPDATE SET parent_ext_id = EXCLUDED.parent_ext_id
+        """).format(s=staging))
+        link_pending_parents(cur)
+    return report_load("debate", len(debates), inserted, time.perf_counter() - t0, "copy")
+
+
+def link_pending_parents(cur) -> int:
+    """ Links debates in debate_pending_parent whose parent now exists, and forgets them. Returns how many. """
+    cur.execute("""
+        WITH linked AS (
+            UPDATE debate d
+               SET parent_ext_id = pp.parent_ext_id
+              FROM debate_pending_parent pp
+             WHERE d.ext_id = pp.ext_id
+               AND EXISTS (SELECT 1 FROM debate p WHERE p.ext_id = pp.parent_ext_id)
+            RETURNING d.ext_id
+        )
+        DELETE FROM debate_pending_parent WHERE ext_id IN (SELECT ext_id FROM linked)
+    """)
+    return cur.rowcount
+
+
+def copy_contributions(conn, contributions: List[Dict]) -> Dict:
+    return _bulk_load(conn, "contribution", contributions, CONTRIBUTION_COLUMNS, conflict="item_id", where="""
+        EXISTS (SELECT 1 FROM debate d WHERE d.ext_id = s.debate_ext_id)
+        AND (s.member_id IS NULL OR EXISTS (SELECT 1 FROM member m WHERE m.member_id = s.member_id))
+    """)
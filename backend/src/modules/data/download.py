@@ -4,24 +4,43 @@ import logging
 # Local imports:
 from .utils import check_date, check_if_members_and_parties_exist
 from ..utils.database_utils import get_db_connection
-from .save import save_parties, save_members, save_debates, save_contributions
-from .scrape import scrape_parties, scrape_members, scrape_debates_and_contributions, get_missing_parties
+from .save import save_parties, save_members, save_batch
+from .scrape import scrape_parties, scrape_members, iter_debates_and_contributions, get_missing_parties
+from .sync import HOUSES, ensure_sync_schema, sync_house
 
 logger = logging.getLogger(__name__)
 ### MAIN FUNCTION YOU WANT TO USE ###
 
-def download_data(start_date: str, end_date: str):
-    """ Downloads data for the specified date range. """
-    if not (check_date(start_date) and check_date(end_date)):
+def download_data(start_date: str = None, end_date: str = None, incremental: bool = False):
+    """
+    Downloads data for the specified date range.
+    With incremental=True only sittings after each house's sync watermark are fetched (up to
+    end_date, default today); start_date then only seeds houses that have never been synced.
+    """
+    if incremental:
+        dates = [d for d in (start_date, end_date) if d]
+    else:
+        dates = [start_date, end_date]
+    if not all(d and check_date(d) for d in dates):
         logger.error("Invalid date format. Please use YYYY-MM-DD.")
         raise ValueError("Invalid date format. Please use YYYY-MM-DD.")
+
+    conn = get_db_connection()
+    try:
+        ensure_sync_schema(conn)
+    finally:
+        conn.close()
+
     if not check_if_members_and_parties_exist():
         logger.info("Members and parties data not found in the database. Downloading...")
         download_members_and_parties()
     else:
         logger.info("Members and parties data already exist in the database. Skipping download.")
 
-    download_debates_and_contributions(start_date, end_date)
+    if incremental:
+        sync_debates_and_contributions(start_date, end_date)
+    else:
+        download_debates_and_contributions(start_date, end_date)
     logger.info("Debates and contributions data downloaded successfully.")
 
 def download_members_and_parties():
@@ -51,20 +70,42 @@ def download_members_and_parties():
     finally:
         conn.close()
 
-def download_debates_and_contributions(start_date, end_date):
-    """ Downloads debates and contributions data from the API. """
-    debates, contributions = scrape_debates_and_contributions(start_date, end_date)
+def download_debates_and_contributions(start_date, end_date, batch_size: int = 50):
+    """
+    Streams debates and contributions from the API into the database.
+    Each micro-batch of `batch_size` debates is committed on its own, so memory stays flat
+    regardless of the date range and a failure loses at most one batch.
+    """
+    debates, contributions = [], []
+    n_debates = n_contributions = n_failed = 0
+
+    conn = get_db_connection()
+    try:
+        for debate, debate_contributions in iter_debates_and_contributions(start_date, end_date):
+            debates.append(debate)
+            contributions.extend(debate_contributions)
+            if len(debates) >= batch_size:
+                if save_batch(conn, debates, contributions):
+                    n_debates += len(debates); n_contributions += len(contributions)
+                else:
+                    n_failed += len(debates)
+                debates, contributions = [], []
+        if debates:
+            if save_batch(conn, debates, contributions):
+                n_debates += len(debates); n_contributions += len(contributions)
+            else:
+                n_failed += len(debates)
+    finally:
+        conn.close()
+
     # Log the number of debates and contributions downloaded
-    logger.info(f"Downloaded {len(debates)} debates and {len(contributions)} contributions.")
-    
-    # Save debates and contributions to the database
+    logger.info(f"Saved {n_debates} debates and {n_contributions} contributions ({n_failed} debates in failed batches).")
+
+def sync_debates_and_contributions(initial_start_date: str = None, end_date: str = None):
+    """ Incrementally syncs each house from its watermark. See modules/data/sync.py. """
     conn = get_db_connection()
     try:
-        save_debates(conn, debates)
-        conn.commit()
-        save_contributions(conn, contributions)
-        conn.commit()
-    except Exception as e:
-        print(f"Error saving debates or contributions: {e}")
+        for house in HOUSES:
+            sync_house(conn, house, initial_start_date=initial_start_date, end_date=end_date)
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
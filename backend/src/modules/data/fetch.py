@@ -0,0 +1,202 @@
+# modules/data/fetch.py
+# Imports
+import os
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Local imports:
+from ..utils.rate_utils import TokenBucket
+from ..utils.cache_utils import DiskCache, FOREVER, cache_key
+
+logger = logging.getLogger(__name__)
+
+# Defaults can be overridden per environment without touching code
+DEFAULT_RATE = float(os.getenv("HANSARD_RATE_LIMIT", "10"))      # requests / second
+DEFAULT_BURST = float(os.getenv("HANSARD_RATE_BURST", "20"))     # bucket size
+DEFAULT_WORKERS = int(os.getenv("HANSARD_MAX_WORKERS", "8"))     # concurrent requests
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Response cache: "readwrite" (default), "replay" (offline - cache only, never touch the network) or "off"
+CACHE_DIR = os.getenv("HANSARD_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "commontalk", "http"))
+CACHE_MODE = os.getenv("HANSARD_CACHE_MODE", "readwrite").lower()
+CACHE_MODES = {"readwrite", "replay", "off"}
+
+
+class Fetcher:
+    """
+    Concurrent HTTP GET engine for the Hansard and Members APIs.
+
+    - One keep-alive `requests.Session` per worker thread (connection pooling)
+    - A shared token bucket so total throughput stays under the API rate limit
+    - Retries with exponential backoff + jitter on 429/5xx and connection errors
+    - An optional on-disk response cache for JSON bodies (see get_json's `ttl`)
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST,
+                 max_workers: int = DEFAULT_WORKERS, retries: int = 5,
+                 backoff: float = 0.5, timeout: float = 30.0,
+                 cache_dir: str = CACHE_DIR, cache_mode: str = CACHE_MODE):
+        if cache_mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {cache_mode!r}; expected one of {sorted(CACHE_MODES)}")
+        self.bucket = TokenBucket(rate, burst)
+        self.max_workers = max(1, int(max_workers))
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache_mode = cache_mode
+        self.cache = DiskCache(cache_dir) if cache_mode != "off" else None
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fetch")
+
+    # -------------------------
+    # Single requests
+    # -------------------------
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._local.session = session
+        return session
+
+    def _sleep_before_retry(self, attempt: int, response: Optional[requests.Response]) -> None:
+        delay = self.backoff * (2 ** attempt)
+        if response is not None and response.headers.get("Retry-After"):
+            try:
+                delay = max(delay, float(response.headers["Retry-After"]))
+            except ValueError:
+                pass
+        time.sleep(delay + random.uniform(0, self.backoff))
+
+    def get(self, url: str, params: Optional[Dict] = None) -> Optional[requests.Response]:
+        """ Rate-limited GET with retries. Returns the last response, or None if every attempt errored. """
+        response = None
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            try:
+                response = self._session().get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                logger.warning(f"Request to {url} failed ({e}); attempt {attempt + 1}/{self.retries + 1}")
+                response = None
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                logger.warning(f"Request to {url} returned {response.status_code}; attempt {attempt + 1}/{self.retries + 1}")
+            if attempt < self.retries:
+                self._sleep_before_retry(attempt, response)
+        return response
+
+    def get_json(self, url: str, params: Optional[Dict] = None, ttl: Optional[float] = None) -> Optional[Dict]:
+        """
+        GET and decode JSON. Returns None on a non-200 response.
+        `ttl` opts the call into the response cache: seconds a stored body stays fresh,
+        FOREVER for immutable resources, None to bypass the cache. In replay mode the
+        cache is the only source and ttl is ignored.
+        """
+        key = cache_key(url, params or {})
+        if self.cache is not None and (ttl is not None or self.cache_mode == "replay"):
+            hit, body = self.cache.get(key, FOREVER if self.cache_mode == "replay" else ttl)
+            if hit:
+                return body
+        if self.cache_mode == "replay":
+            logger.warning(f"Replay mode: no cached response for {url} {params or ''}")
+            return None
+
+        response = self.get(url, params)
+        if response is None:
+            logger.error(f"Giving up on {url}: no response")
+            return None
+        if response.status_code != 200:
+            logger.error(f"Error fetching {url}: {response.status_code}")
+            return None
+        body = response.json()
+        if self.cache is not None and ttl is not None:
+            self.cache.put(key, body, url=url, params=params or {})
+        return body
+
+    # -------------------------
+    # Fan-out helpers
+    # -------------------------
+
+    def imap_unordered(self, fn: Callable, items: Iterable, window: Optional[int] = None) -> Iterator[Tuple[object, object]]:
+        """
+        Applies fn to each item on the pool, yielding (item, result) as they complete.
+        At most `window` calls are in flight, so results never pile up faster than they are consumed.
+        """
+        window = window or 2 * self.max_workers
+        items = iter(items)
+        in_flight = {}
+
+        def top_up():
+            while len(in_flight) < window:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                in_flight[self._executor.submit(fn, item)] = item
+
+        top_up()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                yield item, future.result()
+            top_up()
+
+    def map(self, fn: Callable, items: Iterable) -> List:
+        """ Applies fn to each item on the pool, returning results in input order. """
+        return list(self._executor.map(fn, items))
+
+    def iter_pages(self, url: str, params: Dict, items_key: str,
+                   skip_key: str = "skip", take_key: str = "take",
+                   ttl: Optional[float] = None) -> Iterator[List[Dict]]:
+        """
+        Walks a skip/take paginated endpoint, fetching `max_workers` pages at a time
+        and yielding each page's items in order until the first empty page.
+        """
+        take = params[take_key]
+        skip = params.get(skip_key, 0)
+
+        def fetch_page(page_skip):
+            return self.get_json(url, {**params, skip_key: page_skip}, ttl=ttl)
+
+        while True:
+            skips = [skip + k * take for k in range(self.max_workers)]
+            for page_skip, page in zip(skips, self.map(fetch_page, skips)):
+                if page is None:
+                    raise RuntimeError(f"Failed to fetch page {skip_key}={page_skip} of {url}")
+                items = page.get(items_key)
+                if not items:
+                    return
+                yield items
+            skip = skips[-1] + take
+
+
+_FETCHER: Optional[Fetcher] = None
+_FETCHER_LOCK = threading.Lock()
+
+
+def configure_fetcher(**kwargs) -> Fetcher:
+    """ Replaces the process-wide fetcher, e.g. configure_fetcher(rate=5, max_workers=4). """
+    global _FETCHER
+    with _FETCHER_LOCK:
+        _FETCHER = Fetcher(**kwargs)
+    return _FETCHER
+
+
+def get_fetcher() -> Fetcher:
+    global _FETCHER
+    with _FETCHER_LOCK:
+        if _FETCHER is None:
+            _FETCHER = Fetcher()
+    return _FETCHER
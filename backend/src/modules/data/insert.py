@@ -48,8 +48,8 @@ def insert_debate(conn, debate_data: Dict) -> None:
     """ Inserts debates into the database. """
     cursor = conn.cursor()
     insert_sql = """
-                INSERT INTO debate (ext_id, title, date, house, location, debate_type_id, parent_ext_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                INSERT INTO debate (ext_id, title, date, house, location, debate_type_id, parent_ext_id, content_hash)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                 ON CONFLICT (ext_id) DO NOTHING;
                 """
     cursor.execute(insert_sql, (
@@ -59,7 +59,8 @@ def insert_debate(conn, debate_data: Dict) -> None:
         debate_data['house'],
         debate_data['location'],
         debate_data['debate_type_id'],
-        debate_data['parent_ext_id']
+        debate_data['parent_ext_id'],
+        debate_data.get('content_hash')
     ))
     cursor.close()
 
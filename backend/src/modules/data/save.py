@@ -1,37 +1,109 @@
 # Imports
-from typing import List, Dict
+from typing import List, Dict, Callable
+import time
+import logging
 import psycopg2
 
 # Local Imports
 from .insert import insert_party, insert_member, insert_debate, insert_contribution
+from .bulk import copy_parties, copy_members, copy_debates, copy_contributions, report_load
 
-def save_parties(conn: psycopg2.extensions.connection, parties: List[Dict]) -> None:
+logger = logging.getLogger(__name__)
+
+def _try_bulk(conn: psycopg2.extensions.connection, copy_fn: Callable, rows: List[Dict]) -> bool:
+    """ Runs a COPY loader inside a savepoint. On failure rolls back to it so the row-by-row path can run. """
+    cursor = conn.cursor()
+    cursor.execute("SAVEPOINT bulk_load;")
+    try:
+        copy_fn(conn, rows)
+        cursor.execute("RELEASE SAVEPOINT bulk_load;")
+        return True
+    except Exception as e:
+        logger.warning(f"Bulk load via {copy_fn.__name__} failed, falling back to row-by-row inserts: {e}")
+        cursor.execute("ROLLBACK TO SAVEPOINT bulk_load;")
+        return False
+    finally:
+        cursor.close()
+
+def save_parties(conn: psycopg2.extensions.connection, parties: List[Dict], bulk: bool = True) -> None:
     """ Saves party data to the PostgreSQL database. """
+    if bulk and _try_bulk(conn, copy_parties, parties):
+        return
+    t0 = time.perf_counter()
     for party in parties:
         insert_party(conn, party)
+    report_load("party", len(parties), len(parties), time.perf_counter() - t0, "row")
 
-def save_members(conn: psycopg2.extensions.connection, members: List[Dict]) -> None:
+def save_members(conn: psycopg2.extensions.connection, members: List[Dict], bulk: bool = True) -> None:
     """ Saves member data to the PostgreSQL database. """
+    if bulk and _try_bulk(conn, copy_members, members):
+        return
+    t0 = time.perf_counter()
+    failed = 0
     for member in members:
         try:
             insert_member(conn, member)
         except Exception as e1:
+            failed += 1
             print(f"Error inserting member {member['member_id']}: {e1}")
+    report_load("member", len(members), len(members) - failed, time.perf_counter() - t0, "row")
 
-def save_debates(conn: psycopg2.extensions.connection, debates: List[Dict]) -> None:
-    """ Saves debates to the PostgreSQL database. """
+def _insert_row_or_skip(conn: psycopg2.extensions.connection, insert_fn: Callable, row: Dict) -> bool:
+    """ Runs one row insert inside a savepoint, so a failed row doesn't abort the rest of the transaction. """
+    cursor = conn.cursor()
+    cursor.execute("SAVEPOINT row_insert;")
+    try:
+        insert_fn(conn, row)
+        cursor.execute("RELEASE SAVEPOINT row_insert;")
+        return True
+    except Exception:
+        cursor.execute("ROLLBACK TO SAVEPOINT row_insert;")
+        raise
+    finally:
+        cursor.close()
+
+def save_debates(conn: psycopg2.extensions.connection, debates: List[Dict], bulk: bool = True, commit: bool = True) -> None:
+    """ Saves debates to the PostgreSQL database. With commit=False the caller owns the transaction. """
+    if bulk and _try_bulk(conn, copy_debates, debates):
+        return
+    t0 = time.perf_counter()
+    failed = 0
     for debate in debates:
         try:
-            insert_debate(conn, debate)
-            conn.commit()
+            _insert_row_or_skip(conn, insert_debate, debate)
+            if commit:
+                conn.commit()
         except Exception as e:
+            failed += 1
             print(f"Error inserting debate {debate['ext_id']}: {e}")
+    report_load("debate", len(debates), len(debates) - failed, time.perf_counter() - t0, "row")
 
 
-def save_contributions(conn: psycopg2.extensions.connection, contributions: List[Dict]) -> None:
+def save_contributions(conn: psycopg2.extensions.connection, contributions: List[Dict], bulk: bool = True) -> None:
     """ Saves contributions to the PostgreSQL database. """
+    if bulk and _try_bulk(conn, copy_contributions, contributions):
+        return
+    t0 = time.perf_counter()
+    failed = 0
     for contribution in contributions:
         try:
-            insert_contribution(conn, contribution)
+            _insert_row_or_skip(conn, insert_contribution, contribution)
         except Exception as e:
+            failed += 1
             print(f"Error inserting contribution {contribution['ext_id']}: {e}")
+    report_load("contribution", len(contributions), len(contributions) - failed, time.perf_counter() - t0, "row")
+
+def save_batch(conn, debates, contributions) -> bool:
+    """
+    Saves and commits one micro-batch of debates and their contributions, all or nothing:
+    a debate committed without its contributions would never be fetched again.
+    """
+    try:
+        save_debates(conn, debates, commit=False)
+        save_contributions(conn, contributions)
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error saving batch of {len(debates)} debates: {e}")
+        return False
@@ -1,12 +1,12 @@
 
 # Imports
-import requests
-import time
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
 import logging
 
 # Local imports:
-from .utils import extract_debate_overview, extract_contributions, find_most_recent_member_id_and_attribution
+from .utils import parse_debate, find_most_recent_member_id_and_attribution
+from .fetch import get_fetcher
+from ..utils.cache_utils import FOREVER
 
 # URLS:
 BASE_URL = "https://hansard-api.parliament.uk/"
@@ -14,16 +14,24 @@ DEBATE_URL = BASE_URL + "debates/"
 SEARCH_URL = BASE_URL + "search/"
 MEMBERS_URL = "https://members-api.parliament.uk/api/"
 
+# Response cache TTLs (seconds) per endpoint class
+DEBATE_TTL = FOREVER       # published debate bodies don't change under us
+SEARCH_TTL = 60 * 60       # search pages grow as new sittings are published
+MEMBERS_TTL = 24 * 60 * 60 # members and parties change slowly
+
 logger = logging.getLogger(__name__)
 
 def scrape_parties() -> List[Dict]:
     """ Scrapes party data. """
 
     party_data = []
+    fetcher = get_fetcher()
 
-    for house in range(1, 3):  # Loop through both houses
-        response = requests.get(MEMBERS_URL + "parties/getActive/" + str(house))
-        response_data = response.json()
+    # Both houses at once
+    responses = fetcher.map(lambda house: fetcher.get_json(MEMBERS_URL + "parties/getActive/" + str(house), ttl=MEMBERS_TTL), range(1, 3))
+    for response_data in responses:
+        if not response_data:
+            continue
         for party in response_data['items']:
             values = party.get('value', {})
             party_data.append({
@@ -37,7 +45,6 @@ def scrape_parties() -> List[Dict]:
                 "governmentType": values.get('governmentType'),
                 "isIndependentParty": values.get('isIndependentParty', False)
             })
-        time.sleep(0.05)
     return party_data
 
 def scrape_members() -> List[Dict]:
@@ -47,13 +54,9 @@ def scrape_members() -> List[Dict]:
         'take': 20,
     }
     member_data = []
-    while True:
-        if search_params['skip'] % 1000 == 0: print(f"Fetching members with skip={search_params['skip']}")
-        response = requests.get(MEMBERS_URL + "Members/Search", params=search_params)
-        response_data = response.json()
-        if not response_data['items']:
-          break
-        for member in response_data['items']:
+    for items in get_fetcher().iter_pages(MEMBERS_URL + "Members/Search", search_params, items_key='items', ttl=MEMBERS_TTL):
+        if len(member_data) % 1000 < search_params['take']: print(f"Fetched {len(member_data)} members so far")
+        for member in items:
             values = member.get('value', {})
             member_data.append({
                 'member_id': values.get('id'),
@@ -65,67 +68,65 @@ def scrape_members() -> List[Dict]:
                 'latestHouseMembership': values.get('latestHouseMembership', {}).get('membershipFromId', None),
                 'thumbnailUrl': values.get('thumbnailUrl', None),
             })
-        search_params['skip'] += search_params['take']
-        time.sleep(0.05)
     return member_data
 
 def scrape_debates_and_contributions(start_date:str, end_date: str) -> tuple[List[Dict], List[Dict]]:
-    """ Scrapes debates and their contributions. """
+    """ Scrapes debates and their contributions. Holds the whole range in memory - prefer iter_debates_and_contributions. """
+    debates_data = []
+    contributions_data = []
+    for debate, contributions in iter_debates_and_contributions(start_date, end_date):
+        debates_data.append(debate)
+        contributions_data.extend(contributions)
+    return debates_data, contributions_data
+
+def iter_debates_and_contributions(start_date: str, end_date: str) -> Iterator[Tuple[Dict, List[Dict]]]:
+    """ Yields (debate, contributions) for each debate not yet in the database, as soon as it is parsed. """
     debate_ids = scrape_debate_ids(start_date, end_date)
     remaining_debate_ids = get_debates_not_added(debate_ids, start_date, end_date)
     print(f"Found {len(debate_ids)} debates.")
     print(f"Found {len(remaining_debate_ids)} left to scrape")
-    
-    debates_data = []
-    contributions_data = []
 
-    for i, debate_ext_id in enumerate(remaining_debate_ids):
-        if i % 50 == 0: print(f"Processing debate {i + 1}/{len(debate_ids)}: {debate_ext_id}")
-        debate_data = scrape_debate_data(debate_ext_id)
+    # Fetches run concurrently; the fetcher's token bucket keeps us under the server-side rate limit
+    # and its bounded window means parsed debates never queue up faster than the caller consumes them.
+    results = get_fetcher().imap_unordered(scrape_debate_data, remaining_debate_ids)
+    for i, (debate_ext_id, debate_data) in enumerate(results):
+        if i % 50 == 0: print(f"Processing debate {i + 1}/{len(remaining_debate_ids)}: {debate_ext_id}")
 
         if debate_data:
-            debates_data.append(extract_debate_overview(debate_data))
-            contributions_data.extend(extract_contributions(debate_data))
-        
-        time.sleep(0.05)  # Rate limiting server side
-    
-    return debates_data, contributions_data
+            parsed = parse_debate(debate_data)
+            yield parsed["overview"], parsed["contributions"]
 
-def scrape_debate_ids(start_date: str, end_date: str) -> List[str]:
+def scrape_debate_ids(start_date: str, end_date: str, house: Optional[str] = None) -> List[str]:
     """ Scrapes debate external IDs within a date range. """
+    debate_ext_ids = []
+    for page in iter_debate_id_pages(start_date, end_date, house=house):
+        debate_ext_ids.extend(page)
+    return debate_ext_ids
+
+def iter_debate_id_pages(start_date: str, end_date: str, house: Optional[str] = None, skip: int = 0) -> Iterator[List[str]]:
+    """ Yields pages of debate external IDs within a date range, optionally for one house, starting at `skip`. """
     search_params = {
         'startDate': start_date,
         'endDate': end_date,
         'take': 100,
-        'skip': 0,
+        'skip': skip,
     }
-    debate_ext_ids = []
-    
-    while True:
-        response = requests.get(SEARCH_URL + "debates.json", params=search_params)
-        response_data = response.json()
-        if not response_data['Results']:
-            break
-        for debate in response_data['Results']:
-            debate_ext_ids.append(debate['DebateSectionExtId'])
-        
-        search_params['skip'] += search_params['take']
-        time.sleep(0.05)
-    return debate_ext_ids
-
-def scrape_debate_data(debate_ext_id: str) -> Optional[Dict]:
-    """ Fetches detailed data for a specific debate by its external ID. """
-    response = requests.get(DEBATE_URL + "debate/" + debate_ext_id + ".json")
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f"Error fetching data for {debate_ext_id}: {response.status_code}")
-        return None
+    if house:
+        search_params['house'] = house
+
+    for results in get_fetcher().iter_pages(SEARCH_URL + "debates.json", search_params, items_key='Results', ttl=SEARCH_TTL):
+        yield [debate['DebateSectionExtId'] for debate in results]
+
+def scrape_debate_data(debate_ext_id: str, refresh: bool = False) -> Optional[Dict]:
+    """ Fetches detailed data for a specific debate by its external ID. `refresh` bypasses (and updates) the cache. """
+    debate_data = get_fetcher().get_json(DEBATE_URL + "debate/" + debate_ext_id + ".json", ttl=0 if refresh else DEBATE_TTL)
+    if debate_data is None:
+        print(f"Error fetching data for {debate_ext_id}")
+    return debate_data
     
 def scrape_party(party_id: str) -> Optional[Dict]:
-    response = requests.get(MEMBERS_URL + f"Members/Search?PartyId={party_id}&skip=0&take=1")
-    if response.status_code == 200:
-        member_data = response.json()
+    member_data = get_fetcher().get_json(MEMBERS_URL + "Members/Search", params={'PartyId': party_id, 'skip': 0, 'take': 1}, ttl=MEMBERS_TTL)
+    if member_data is not None:
         first_member = member_data['items'][0]['value'] if member_data['items'] else None
         if first_member:
             party_info = first_member.get('latestParty', {})
@@ -148,7 +149,7 @@ def scrape_party(party_id: str) -> Optional[Dict]:
             logger.warning(f"No members found for party {party_id}")
             return None
     else:
-        logger.error(f"Error fetching party data for {party_id}: {response.status_code}")
+        logger.error(f"Error fetching party data for {party_id}")
         return None
 
 def get_missing_parties(party_data: List[Dict], member_data: List[Dict]) -> List[Dict]:
@@ -162,8 +163,7 @@ def get_missing_parties(party_data: List[Dict], member_data: List[Dict]) -> List
     
     # Return list of missing party dictionaries
     missing_parties = []
-    for missing_party_id in missing_party_ids:
-        missing_party = scrape_party(missing_party_id)
+    for missing_party in get_fetcher().map(scrape_party, missing_party_ids):
         if missing_party:
             missing_parties.append(missing_party)
 
@@ -0,0 +1,206 @@
+# modules/data/sync.py
+# Imports
+import os
+import json
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+# Local imports:
+from .utils import extract_debate_overview, extract_contributions, parse_debate
+from .save import save_batch, save_contributions
+from .scrape import iter_debate_id_pages, scrape_debate_data
+from .fetch import get_fetcher
+
+logger = logging.getLogger(__name__)
+
+HOUSES = ["Commons", "Lords"]
+# Days behind the watermark that are re-listed and re-checked for late or revised debates
+REVISION_WINDOW_DAYS = int(os.getenv("HANSARD_REVISION_WINDOW_DAYS", "3"))
+
+
+# =========================
+# Sync state
+# =========================
+
+def ensure_sync_schema(conn) -> None:
+    """
+    Idempotently adds the sync-state and pending-parent tables and debate.content_hash to
+    databases created before them.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                house VARCHAR(50) PRIMARY KEY,
+                last_synced_date DATE,
+                cursor JSONB NOT NULL DEFAULT '{}'::jsonb,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """)
+        cur.execute("ALTER TABLE debate ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS debate_pending_parent (
+                ext_id VARCHAR(255) PRIMARY KEY REFERENCES debate(ext_id) ON DELETE CASCADE,
+                parent_ext_id VARCHAR(255) NOT NULL
+            );
+        """)
+    conn.commit()
+
+def get_sync_state(conn, house: str) -> Optional[Dict]:
+    """ Returns {"last_synced_date": date | None, "cursor": dict} for a house, or None if never synced. """
+    with conn.cursor() as cur:
+        cur.execute("SELECT last_synced_date, cursor FROM sync_state WHERE house = %s;", (house,))
+        row = cur.fetchone()
+    if not row:
+        return None
+    return {"last_synced_date": row[0], "cursor": row[1] or {}}
+
+def save_sync_state(conn, house: str, last_synced_date: Optional[date], cursor: Dict) -> None:
+    """ Upserts and commits the watermark and cursor for a house. """
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO sync_state (house, last_synced_date, cursor, updated_at)
+            VALUES (%s, %s, %s::jsonb, now())
+            ON CONFLICT (house) DO UPDATE
+               SET last_synced_date = EXCLUDED.last_synced_date,
+                   cursor = EXCLUDED.cursor,
+                   updated_at = now();
+        """, (house, last_synced_date, json.dumps(cursor)))
+    conn.commit()
+
+
+# =========================
+# Per-day sync
+# =========================
+
+def filter_new_debate_ids(conn, debate_ids: List[str]) -> List[str]:
+    """ Returns the IDs from `debate_ids` that are not in the database. Looks up only the given IDs. """
+    if not debate_ids:
+        return []
+    with conn.cursor() as cur:
+        cur.execute("SELECT ext_id FROM debate WHERE ext_id = ANY(%s);", (list(debate_ids),))
+        existing = {row[0] for row in cur.fetchall()}
+    return [ext_id for ext_id in debate_ids if ext_id not in existing]
+
+def fetch_and_save_debates(conn, debate_ids: List[str]) -> int:
+    """ Fetches the given debates concurrently and saves them as one micro-batch. Returns debates saved. """
+    debates, contributions = [], []
+    for _, debate_data in get_fetcher().imap_unordered(scrape_debate_data, debate_ids):
+        if debate_data:
+            parsed = parse_debate(debate_data)
+            debates.append(parsed["overview"])
+            contributions.extend(parsed["contributions"])
+    if debates and not save_batch(conn, debates, contributions):
+        raise RuntimeError(f"Failed to save batch of {len(debates)} debates")
+    return len(debates)
+
+def sync_day(conn, house: str, day: date, watermark: Optional[date], skip: int = 0) -> int:
+    """
+    Ingests the debates for one house on one sitting day, a search page at a time.
+    After each page is persisted the cursor records the page offset, so an interrupted
+    day resumes from the next page instead of starting over.
+    """
+    saved = 0
+    d = day.isoformat()
+    for page in iter_debate_id_pages(d, d, house=house, skip=skip):
+        saved += fetch_and_save_debates(conn, filter_new_debate_ids(conn, page))
+        skip += len(page)
+        save_sync_state(conn, house, watermark, {"date": d, "skip": skip})
+    return saved
+
+
+# =========================
+# Revision detection
+# =========================
+
+def replace_debate_content(conn, debate: Dict, contributions: List[Dict]) -> None:
+    """
+    Swaps in revised content for an existing debate: its points and contributions are
+    replaced and the debate is flagged for re-analysis.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            DELETE FROM point
+            WHERE contribution_item_id IN (SELECT item_id FROM contribution WHERE debate_ext_id = %s);
+        """, (debate["ext_id"],))
+        cur.execute("DELETE FROM contribution WHERE debate_ext_id = %s;", (debate["ext_id"],))
+        cur.execute("""
+            UPDATE debate
+               SET title = %s, location = %s, debate_type_id = %s, content_hash = %s, analysed = FALSE
+             WHERE ext_id = %s;
+        """, (debate["title"], debate["location"], debate["debate_type_id"], debate["content_hash"], debate["ext_id"]))
+    save_contributions(conn, contributions)
+    conn.commit()
+
+def refresh_changed_debates(conn, house: str, start: date, end: date) -> int:
+    """
+    Re-fetches (bypassing the response cache) the debates already stored for a house between
+    start and end, and replaces any whose content hash changed. Debates stored before hashes
+    were recorded just have their hash filled in. Returns the number of revised debates.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT ext_id, content_hash FROM debate
+            WHERE house = %s AND date >= %s AND date < %s::date + 1;
+        """, (house, start, end))
+        stored = dict(cur.fetchall())
+
+    revised = 0
+    results = get_fetcher().imap_unordered(lambda ext_id: scrape_debate_data(ext_id, refresh=True), stored)
+    for ext_id, debate_data in results:
+        if not debate_data:
+            continue
+        debate = extract_debate_overview(debate_data)
+        if stored[ext_id] is None:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE debate SET content_hash = %s WHERE ext_id = %s;", (debate["content_hash"], ext_id))
+            conn.commit()
+        elif stored[ext_id] != debate["content_hash"]:
+            logger.info(f"Debate {ext_id} changed since ingestion; replacing its contributions")
+            replace_debate_content(conn, debate, extract_contributions(debate_data))
+            revised += 1
+    return revised
+
+
+# =========================
+# Entry point
+# =========================
+
+def sync_house(conn, house: str, initial_start_date: Optional[str] = None, end_date: Optional[str] = None,
+               revision_days: int = REVISION_WINDOW_DAYS) -> Dict[str, int]:
+    """
+    Incrementally syncs one house: re-checks the last `revision_days` before the watermark for
+    late or revised debates, then ingests each new sitting day up to `end_date` (default today),
+    advancing the watermark as each day completes. `initial_start_date` seeds a house that has
+    never been synced.
+    """
+    state = get_sync_state(conn, house) or {"last_synced_date": None, "cursor": {}}
+    watermark = state["last_synced_date"]
+    end = date.fromisoformat(end_date) if end_date else date.today()
+    if watermark:
+        start = watermark + timedelta(days=1)
+    elif initial_start_date:
+        start = date.fromisoformat(initial_start_date)
+    else:
+        raise ValueError(f"No sync state for {house}; pass a start date to seed it.")
+
+    stats = {"new": 0, "revised": 0}
+    if watermark and revision_days > 0:
+        window_start = watermark - timedelta(days=revision_days - 1)
+        stats["revised"] = refresh_changed_debates(conn, house, window_start, watermark)
+        day = window_start
+        while day <= watermark:
+            stats["new"] += sync_day(conn, house, day, watermark)
+            day += timedelta(days=1)
+
+    cursor = state["cursor"]
+    day = start
+    while day <= end:
+        skip = cursor.get("skip", 0) if cursor.get("date") == day.isoformat() else 0
+        stats["new"] += sync_day(conn, house, day, watermark, skip=skip)
+        watermark = day
+        save_sync_state(conn, house, watermark, {})
+        day += timedelta(days=1)
+
+    logger.info(f"{house}: synced through {watermark} - {stats['new']} new debates, {stats['revised']} revised")
+    return stats
@@ -1,5 +1,7 @@
 # Imports:
 from typing import List, Dict, Optional
+import hashlib
+import json
 import time
 
 # Local imports:
@@ -15,11 +17,17 @@ def extract_debate_overview(debate_data: Dict) -> Dict:
         "house": overview.get('House'),
         "location": overview.get('Location'),
         "debate_type_id": overview.get('DebateTypeId'),
-        "parent_ext_id": debate_data['Navigator'][-1]['ExternalId'] if 'Navigator' in debate_data and len(debate_data['Navigator']) > 1 else None
+        "parent_ext_id": debate_data['Navigator'][-1]['ExternalId'] if 'Navigator' in debate_data and len(debate_data['Navigator']) > 1 else None,
+        "content_hash": debate_content_hash(debate_data),
     }
 
+def debate_content_hash(debate_data: Dict) -> str:
+    """ Fingerprint of a debate's published content, used to spot Hansard revisions after ingestion. """
+    payload = json.dumps(debate_data.get('Items', []), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 def find_most_recent_member_id_and_attribution(debate_data: Dict, contribution_index: int) -> Optional[tuple[str,str]]:
-    """ Finds the most recent member ID for a contribution in a debate. """
+    """ Finds the most recent member ID for a contribution in a debate. O(n) per call - extract_contributions carries the speaker forward instead. """
     
     for i in range(contribution_index, -1, -1):
         contribution = debate_data.get('Items', [])[i]
@@ -28,14 +36,20 @@ def find_most_recent_member_id_and_attribution(debate_data: Dict, contribution_i
                 return contribution.get('MemberId'), contribution.get('AttributedTo')
     return None, None
 def extract_contributions(debate_data: Dict) -> List[Dict]:
-    """ Extracts contributions from debate data. """
+    """
+    Extracts contributions from debate data in a single pass.
+    Unattributed paragraph items inherit the speaker of the most recent attributed `hs_para`,
+    which is carried forward rather than searched for backwards from every item.
+    """
     contributions = []
-    for i, contribution in enumerate(debate_data.get('Items', [])):
+    debate_ext_id = debate_data.get('Overview', {}).get('ExtId')
+    speaker_id, speaker_attribution = None, None
+    for contribution in debate_data.get('Items', []):
         contribution_dict = {
             "ext_id" : contribution.get('ExternalId'),
             "item_id": contribution.get('ItemId'),
             "type": contribution.get('ItemType'),
-            "debate_section_ext_id": debate_data.get('Overview', {}).get('ExtId'),
+            "debate_section_ext_id": debate_ext_id,
             "member_id": contribution.get('MemberId'),
             "attributed_to": contribution.get('AttributedTo'),
             "value": contribution.get('Value'),
@@ -43,14 +57,43 @@ def extract_contributions(debate_data: Dict) -> List[Dict]:
             "timecode": contribution.get('Timecode'),
             "hrs_tag": contribution.get('HRSTag', None),
         }
-        if contribution_dict["hrs_tag"] in ["hs_para", "hs_parafo", "hs_quotefo"] and not contribution_dict["member_id"]:
-            member_id, attribution = find_most_recent_member_id_and_attribution(debate_data, i)
-            if member_id:
-                contribution_dict["member_id"] = member_id
-                contribution_dict["attributed_to"] = attribution
+        if contribution_dict["hrs_tag"] == 'hs_para' and contribution_dict["member_id"]:
+            speaker_id, speaker_attribution = contribution_dict["member_id"], contribution_dict["attributed_to"]
+        elif contribution_dict["hrs_tag"] in ["hs_para", "hs_parafo", "hs_quotefo"] and not contribution_dict["member_id"] and speaker_id:
+            contribution_dict["member_id"] = speaker_id
+            contribution_dict["attributed_to"] = speaker_attribution
         contributions.append(contribution_dict)
     return contributions
 
+def parse_debate(debate_data: Dict) -> Dict:
+    """
+    Parses a debate once into a compact form:
+      overview      : as extract_debate_overview
+      contributions : as extract_contributions
+      speeches      : runs of consecutive contributions by the same member, as
+                      {"member_id", "attributed_to", "text", "item_ids"} - handy for building prompts
+    """
+    contributions = extract_contributions(debate_data)
+    speeches = []
+    for contribution in contributions:
+        if not contribution["member_id"] or not contribution["value"]:
+            continue
+        if speeches and speeches[-1]["member_id"] == contribution["member_id"]:
+            speeches[-1]["text"] += "\n" + contribution["value"]
+            speeches[-1]["item_ids"].append(contribution["item_id"])
+        else:
+            speeches.append({
+                "member_id": contribution["member_id"],
+                "attributed_to": contribution["attributed_to"],
+                "text": contribution["value"],
+                "item_ids": [contribution["item_id"]],
+            })
+    return {
+        "overview": extract_debate_overview(debate_data),
+        "contributions": contributions,
+        "speeches": speeches,
+    }
+
 def check_if_members_and_parties_exist():
     """ Checks if members and parties data exist in the database. """
     conn = get_db_connection()
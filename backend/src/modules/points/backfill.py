@@ -0,0 +1,109 @@
+# modules/points/backfill.py
+import argparse
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, Tuple
+
+from psycopg2.extras import execute_values
+from pgvector.psycopg2 import register_vector
+
+from ..utils.database_utils import get_db_connection
+from .embed import compact_embedding
+from .utils import ensure_generation_columns
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched and updated per statement inside a chunk
+FETCH_SIZE = 1000
+
+_conn = None
+
+
+def _worker_connection():
+    """ One connection per worker process, reused across the chunks it is handed. """
+    global _conn
+    if _conn is None or _conn.closed:
+        _conn = get_db_connection()
+        register_vector(_conn)
+    return _conn
+
+
+def point_id_ranges(conn, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """ Splits the point_id space into half-open [lo, hi) ranges of `chunk_size` ids. """
+    with conn.cursor() as cur:
+        cur.execute("SELECT min(point_id), max(point_id) FROM point WHERE emb256_f16 IS NULL;")
+        lo, hi = cur.fetchone()
+    if lo is None:
+        return
+    for start in range(lo, hi + 1, chunk_size):
+        yield start, min(start + chunk_size, hi + 1)
+
+
+def backfill_range(lo: int, hi: int) -> int:
+    """ Fills emb256_f16 for points in [lo, hi) that have an embedding but no compact copy. Returns rows updated. """
+    conn = _worker_connection()
+    updated = 0
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT point_id, point_embedding FROM point
+                WHERE point_id >= %s AND point_id < %s
+                  AND emb256_f16 IS NULL AND point_embedding IS NOT NULL;
+            """, (lo, hi))
+            for rows in iter(lambda: cur.fetchmany(FETCH_SIZE), []):
+                values = [(pid, compact_embedding(emb)) for pid, emb in rows]
+                with conn.cursor() as up:
+                    execute_values(up, """
+                        UPDATE point AS p SET emb256_f16 = v.emb
+                        FROM (VALUES %s) AS v(point_id, emb)
+                        WHERE p.point_id = v.point_id;
+                    """, values, template="(%s::bigint, %s::bytea)", page_size=FETCH_SIZE)
+                    updated += up.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return updated
+
+
+def backfill_emb256(workers: int = 4, chunk_size: int = 5000) -> int:
+    """
+    Fills point.emb256_f16 for every point that lacks it, converting in Python across
+    `workers` processes, each with its own connection and committing per point_id range.
+    Safe to interrupt and re-run: finished ranges are skipped. Returns rows updated.
+    """
+    conn = get_db_connection()
+    ensure_generation_columns(conn)
+    ranges = list(point_id_ranges(conn, chunk_size))
+    conn.close()
+    if not ranges:
+        print("No points need emb256_f16.")
+        return 0
+
+    started = time.perf_counter()
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(backfill_range, lo, hi): (lo, hi) for lo, hi in ranges}
+        for i, future in enumerate(as_completed(futures), 1):
+            lo, hi = futures[future]
+            try:
+                total += future.result()
+            except Exception as e:
+                logger.error(f"Backfill of point_id range [{lo}, {hi}) failed: {e}")
+            if i % 10 == 0 or i == len(ranges):
+                elapsed = time.perf_counter() - started
+                print(f"{i}/{len(ranges)} ranges, {total} points ({total / elapsed:.0f} points/sec)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill point.emb256_f16 from point_embedding.")
+    parser.add_argument("--workers", type=int, default=4, help="processes (and connections) to run")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="point_ids per range")
+    args = parser.parse_args()
+    backfill_emb256(workers=args.workers, chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# modules/points/bulk.py
+# Imports
+import io
+import struct
+import time
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+from pgvector import Vector
+
+# Local imports:
+from ..data.bulk import report_load
+from .embed import compact_embedding
+
+logger = logging.getLogger(__name__)
+
+POINT_COLUMNS = ("point_id", "contribution_item_id", "point_value", "point_embedding", "emb256_f16")
+
+# PGCOPY binary framing: signature, flags, header-extension length ... rows ... trailer
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_TRAILER = struct.pack(">h", -1)
+_NULL_FIELD = struct.pack(">i", -1)
+
+
+def _field(data: Optional[bytes]) -> bytes:
+    if data is None:
+        return _NULL_FIELD
+    return struct.pack(">i", len(data)) + data
+
+
+def _text(value: Optional[str]) -> Optional[bytes]:
+    return None if value is None else str(value).encode("utf-8")
+
+
+def _binary_copy_buffer(point_ids: List[int], points: List[Tuple[str, str, list]]) -> io.BytesIO:
+    """ Encodes points for COPY ... FROM STDIN WITH (FORMAT binary); vectors use pgvector's binary format. """
+    buf = io.BytesIO()
+    buf.write(_COPY_HEADER)
+    n_fields = struct.pack(">h", len(POINT_COLUMNS))
+    for point_id, (item_id, value, embedding) in zip(point_ids, points):
+        if embedding is None:
+            vector = compact = None
+        else:
+            v = np.asarray(embedding, dtype=np.float32)
+            vector = Vector(v).to_binary()
+            compact = compact_embedding(v)
+        buf.write(n_fields)
+        buf.write(_field(struct.pack(">q", point_id)))
+        buf.write(_field(_text(item_id)))
+        buf.write(_field(_text(value)))
+        buf.write(_field(vector))
+        buf.write(_field(compact))
+    buf.write(_COPY_TRAILER)
+    buf.seek(0)
+    return buf
+
+
+def allocate_point_ids(cur, n: int) -> List[int]:
+    """ Reserves `n` ids from point's sequence, so rows can be COPYed with known ids. """
+    cur.execute("SELECT nextval(pg_get_serial_sequence('point', 'point_id')) FROM generate_series(1, %s);", (n,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def copy_points(conn, points: List[Tuple[str, str, list]]) -> List[int]:
+    """
+    Writes (contribution_item_id, point_value, embedding) tuples, with their emb256_f16
+    copies, in one binary COPY. Does not commit. Returns the new point_ids in input order.
+    """
+    if not points:
+        return []
+    t0 = time.perf_counter()
+    with conn.cursor() as cur:
+        point_ids = allocate_point_ids(cur, len(points))
+        cur.copy_expert(
+            f"COPY point ({', '.join(POINT_COLUMNS)}) FROM STDIN WITH (FORMAT binary)",
+            _binary_copy_buffer(point_ids, points),
+        )
+    report_load("point", len(points), len(points), time.perf_counter() - t0, "copy")
+    return point_ids
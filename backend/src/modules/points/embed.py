@@ -1,16 +1,162 @@
 from openai import OpenAI
+import hashlib
+import logging
 import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .embed_cache import get_embedding_cache, text_key
+from .utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+EMBED_MODEL = "text-embedding-3-large"
+EMBED_DIMS = 3072
+# Leading dimensions kept in point.emb256_f16, the compact copy the clustering store reads
+COMPACT_DIMS = 256
+# "openai" for the real API, "local" for the deterministic offline stand-in
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "openai").lower()
+# Per-request limits; the API allows 2048 inputs and 300k tokens per request
+MAX_BATCH_INPUTS = int(os.getenv("EMBED_MAX_BATCH_INPUTS", "512"))
+MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "200000"))
+
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OpenAI:
+    """ One OpenAI client (and connection pool) per process. """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+def clean_text(text: str) -> str:
+    return text.replace("\n", " ").replace("\r", " ").strip()
+
+
+class OpenAIEmbeddingBackend:
+    model = EMBED_MODEL
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = get_client().embeddings.create(input=texts, model=EMBED_MODEL)
+        # The API tags each embedding with its input index; don't rely on response order
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+
+class LocalEmbeddingBackend:
+    """
+    Deterministic offline stand-in: unit vectors seeded from a hash of the text, so the
+    same text always gets the same embedding. `latency` (seconds per request) simulates
+    the network round trip for benchmarks.
+    """
+
+    def __init__(self, dims: int = EMBED_DIMS, latency: float = 0.0):
+        self.model = f"local-{dims}"
+        self.dims = dims
+        self.latency = latency
+        self.requests = 0
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        out = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            v = np.random.default_rng(seed).standard_normal(self.dims).astype(np.float32)
+            out.append((v / np.linalg.norm(v)).tolist())
+        return out
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    with _client_lock:
+        if _backend is None:
+            _backend = LocalEmbeddingBackend() if EMBED_BACKEND == "local" else OpenAIEmbeddingBackend()
+    return _backend
+
+
+def set_backend(backend) -> None:
+    """ Swaps the process-wide backend, e.g. set_backend(LocalEmbeddingBackend(latency=0.2)). """
+    global _backend
+    with _client_lock:
+        _backend = backend
+
+
+def batches(texts: List[str], max_inputs: int = MAX_BATCH_INPUTS, max_tokens: int = MAX_BATCH_TOKENS) -> Iterator[List[int]]:
+    """ Groups input indices into requests that respect both the input-count and token limits. """
+    batch, tokens = [], 0
+    for i, text in enumerate(texts):
+        t = estimate_tokens(text)
+        if batch and (len(batch) >= max_inputs or tokens + t > max_tokens):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(i)
+        tokens += t
+    if batch:
+        yield batch
+
+
+def embed_batch(texts: List[str], use_cache: bool = True) -> List[Optional[List[float]]]:
+    """
+    Embeds many texts with as few requests as possible. Identical texts are sent once, and
+    texts already in the embedding cache are not sent at all.
+    Returns embeddings in input order; entries are None where a request failed.
+    """
+    cleaned = [clean_text(t) for t in texts]
+    unique: Dict[str, int] = {}
+    for text in cleaned:
+        unique.setdefault(text, len(unique))
+    unique_texts = list(unique)
+
+    vectors: List[Optional[List[float]]] = [None] * len(unique_texts)
+    backend = get_backend()
+    cache = get_embedding_cache() if use_cache else None
+    keys = [text_key(backend.model, t) for t in unique_texts]
+    if cache:
+        cached = cache.get_many(keys)
+        for i, key in enumerate(keys):
+            vectors[i] = cached.get(key)
+
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    fresh = {}
+    for batch in batches([unique_texts[i] for i in missing]):
+        idx = [missing[j] for j in batch]
+        try:
+            for i, embedding in zip(idx, backend.embed([unique_texts[i] for i in idx])):
+                vectors[i] = embedding
+                fresh[keys[i]] = embedding
+        except Exception as e:
+            logger.error(f"Error generating embeddings for a batch of {len(batch)} texts: {e}")
+    if cache:
+        cache.put_many(backend.model, fresh)
+    return [vectors[unique[text]] for text in cleaned]
+
+
+def compact_embedding(embedding, dims: int = COMPACT_DIMS) -> Optional[bytes]:
+    """
+    Truncates an embedding to its first `dims` components, re-normalises it to unit length
+    and returns the float16 bytes stored in point.emb256_f16. text-embedding-3 vectors are
+    trained so that a re-normalised prefix is still a usable embedding.
+    """
+    if embedding is None:
+        return None
+    v = np.asarray(embedding, dtype=np.float32)[:dims]
+    norm = np.linalg.norm(v)
+    if norm > 0:
+        v = v / norm
+    return v.astype(np.float16).tobytes()
+
 
 def embed(point):
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    try:
-        print(f"Generating embedding for point: {point}")
-        text = point.replace("\n", " ").replace("\r", " ").strip()
-        response = client.embeddings.create(
-            input=text,
-            model="text-embedding-3-large",
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"Error generating embedding for point '{text}': {e}")
-        return None
\ No newline at end of file
+    """ Embeds a single text. Prefer embed_batch for more than one. """
+    return embed_batch([point])[0]
@@ -0,0 +1,140 @@
+# modules/points/embed_cache.py
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..utils.database_utils import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# "db" to use the Postgres-backed cache, "off" to always call the provider
+EMBED_CACHE = os.getenv("EMBED_CACHE", "db").lower()
+# Size bound: least-recently-used entries beyond this are evicted
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "500000"))
+# Eviction scans the table, so only run it every this many inserts
+EVICT_EVERY = 5000
+
+
+def text_key(model: str, text: str) -> bytes:
+    """ Content hash for an (already cleaned) text under a given model. """
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Postgres-backed embedding cache keyed by text hash, shared by every process that talks
+    to the database. Embeddings are stored as raw float32 bytes. Any database error disables
+    the cache for the rest of the process rather than failing the embedding call.
+    """
+
+    def __init__(self, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._disabled = False
+        self._since_evict = 0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = get_db_connection()
+            self._conn.autocommit = True
+            with self._conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS embedding_cache (
+                        text_hash BYTEA PRIMARY KEY,
+                        model TEXT NOT NULL,
+                        embedding BYTEA NOT NULL,
+                        hits INTEGER NOT NULL DEFAULT 0,
+                        last_used TIMESTAMPTZ NOT NULL DEFAULT now()
+                    );
+                """)
+                cur.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache(last_used);")
+        return self._conn
+
+    def _disable(self, e: Exception) -> None:
+        logger.warning(f"Embedding cache disabled after database error: {e}")
+        self._disabled = True
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        """ Returns cached embeddings for whichever keys are present. """
+        if self._disabled or not keys:
+            self.misses += len(keys)
+            return {}
+        with self._lock:
+            try:
+                with self._connection().cursor() as cur:
+                    cur.execute("""
+                        UPDATE embedding_cache
+                           SET hits = hits + 1, last_used = now()
+                         WHERE text_hash = ANY(%s)
+                     RETURNING text_hash, embedding;
+                    """, ([bytes(k) for k in keys],))
+                    found = {bytes(h): np.frombuffer(e, dtype=np.float32).tolist() for h, e in cur.fetchall()}
+            except Exception as e:
+                self._disable(e)
+                found = {}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, model: str, entries: Dict[bytes, List[float]]) -> None:
+        if self._disabled or not entries:
+            return
+        from psycopg2.extras import execute_values
+        rows = [(k, model, np.asarray(v, dtype=np.float32).tobytes()) for k, v in entries.items()]
+        with self._lock:
+            try:
+                with self._connection().cursor() as cur:
+                    execute_values(cur, """
+                        INSERT INTO embedding_cache (text_hash, model, embedding)
+                        VALUES %s
+                        ON CONFLICT (text_hash) DO NOTHING
+                    """, rows)
+                self._since_evict += len(rows)
+                if self._since_evict >= EVICT_EVERY:
+                    self._since_evict = 0
+                    self._evict()
+            except Exception as e:
+                self._disable(e)
+
+    def _evict(self) -> None:
+        """ Drops least-recently-used entries beyond max_entries. """
+        with self._conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM embedding_cache;")
+            excess = cur.fetchone()[0] - self.max_entries
+            if excess > 0:
+                cur.execute("""
+                    DELETE FROM embedding_cache
+                    WHERE text_hash IN (SELECT text_hash FROM embedding_cache ORDER BY last_used ASC LIMIT %s);
+                """, (excess,))
+                logger.info(f"Evicted {cur.rowcount} embedding cache entries")
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """ The process-wide cache, or None when EMBED_CACHE=off. """
+    global _cache
+    if EMBED_CACHE == "off":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+    return _cache
+
+
+def get_cache_stats() -> Dict[str, float]:
+    cache = get_embedding_cache()
+    return cache.stats() if cache else {"hits": 0, "misses": 0, "hit_rate": 0.0}
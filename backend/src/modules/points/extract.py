@@ -1,26 +1,15 @@
-from groq import Groq
 import json
-import os
-from typing import List
-from .utils import clean_llm_response
+from typing import Dict, List, Optional
+from .utils import clean_llm_response, clean_llm_json_object
 from ..utils.message_utils import messages
-from .prompts import system_prompt
+from ..utils.llm_gateway import get_gateway
+from .prompts import system_prompt, packed_system_prompt
 
-def extract_points(model_input, retries=3) -> List[str]:
+def extract_points(model_input, retries=3, refresh=False) -> List[str]:
     """ Generates points for a given prompt and input. """
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
     message_list = messages(system_prompt, model_input)
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=message_list,
-        temperature=0.0,
-        top_p=0.9,
-        stop = None,
-        stream=False,
-    )
-    message = response.choices[0].message.content
-    tokens = response.usage.total_tokens
-    
+    message = get_gateway().complete(message_list, tag="extract_points", refresh=refresh, temperature=0.0, top_p=0.9)
+
     try:
         cleaned_message = clean_llm_response(message)
 
@@ -34,11 +23,36 @@ def extract_points(model_input, retries=3) -> List[str]:
     except json.decoder.JSONDecodeError as e:
         print("JSON error:", e)
         print("Input was:", model_input)
-        print("Response was:", response)
+        print("Response was:", message)
         if retries > 0:
             print("Retrying...")
-            return extract_points(model_input, retries - 1)
+            return extract_points(model_input, retries - 1, refresh=True)
         else:
             print("Silently giving up on trying to generate valid list.")
             return []
-    
\ No newline at end of file
+
+def extract_points_packed(model_input, item_ids: List[str], retries=1, refresh=False) -> Optional[Dict[str, List[str]]]:
+    """
+    Generates points for several contributions in one request. Returns {item_id: points},
+    or None if the response can't be parsed or misses an ID, so the caller can fall back
+    to one extract_points call per contribution.
+    """
+    message_list = messages(packed_system_prompt, model_input)
+    message = get_gateway().complete(message_list, tag="extract_points_packed", refresh=refresh, temperature=0.0, top_p=0.9)
+
+    try:
+        obj = json.loads(clean_llm_json_object(message))
+        results = {}
+        for item_id in item_ids:
+            points = obj[str(item_id)]
+            if isinstance(points, str):
+                points = [points]
+            results[item_id] = [p.strip() for p in points if isinstance(p, str) and p.strip()]
+        return results
+    except (json.decoder.JSONDecodeError, KeyError, TypeError) as e:
+        print(f"Packed response for {len(item_ids)} contributions unusable ({type(e).__name__}: {e})")
+        if retries > 0:
+            print("Retrying...")
+            return extract_points_packed(model_input, item_ids, retries - 1, refresh=True)
+        return None
+
@@ -1,102 +1,118 @@
-from time import time
+import argparse
+import multiprocessing
+import os
+import socket
 from typing import List, Dict
 from ..utils.database_utils import get_db_connection
-from .embed import embed
-from .extract import extract_points
-from .utils import check_contribution, prepare_prompt, fetch_unanalysed_debates, fetch_debate_analysis_counts, mark_as_analysed
-from .save import save_points
-import concurrent.futures
+from ..utils.llm_gateway import get_gateway
+from .embed_cache import get_cache_stats
+from .scheduler import PointScheduler
+from .triage import Triage
+from .utils import fetch_debate_analysis_counts, fetch_contributions, claim_debates, ensure_generation_columns, release_leases
 import time
 #### MAIN FUNCTION WE WANT TO USE ####
 
-def generate_points(batch_size: int = 10, filters: Dict = {"house": "Commons"}):
+def generate_points(batch_size: int = 10, filters: Dict = {"house": "Commons"}, max_workers: int = 16,
+                    worker_id: str = None, lease_seconds: int = 900, pack: bool = True,
+                    triage: bool = True):
     """
     Generates points from debates that have not been analysed yet.
+    Contributions from many debates are extracted concurrently (at most `max_workers` LLM calls
+    at once); more debates are claimed whenever the queue runs low, and each debate is saved
+    and marked analysed as soon as all of its contributions are done.
+
+    Debates are leased from the `debate` table, so any number of generate_points processes
+    (on one machine or several) can run at once; a crashed worker's debates are handed out
+    again once their `lease_seconds` lease expires. Each contribution's points are committed
+    as soon as they are ready, so a restarted debate only redoes unfinished contributions.
+    With `pack`, runs of short contributions are extracted several to a request; with `triage`,
+    procedural, very short and repeated contributions are skipped before the LLM (see triage.py).
     """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
     conn = get_db_connection()
-    analysis_pass = 0
+    ensure_generation_columns(conn)
     # First print the number of unanalysed debates
     counts = fetch_debate_analysis_counts(conn, filters)
     print("Analysed:", counts["analysed"], "Unanalysed:", counts["unanalysed"])
     time.sleep(1)
 
-    while True:
-        print(f"Starting analysis pass {analysis_pass + 1} with batch size {batch_size}")
-        debate_list = fetch_unanalysed_debates(conn, batch_size, filters)    
-
-        if not debate_list:
-            print(f"analysed {analysis_pass * batch_size} debates")
-            conn.close()
-            print("All debates processed.")
-            break
+    scheduler = PointScheduler(conn, worker_id, max_workers=max_workers, lease_seconds=lease_seconds, pack=pack,
+                               triage=Triage() if triage else None)
+    exhausted = False
+    last_renewal = time.monotonic()
+    try:
+        while True:
+            # Keep roughly two jobs queued per worker so neither the LLM nor the embedder sits idle
+            if not exhausted and scheduler.in_flight < 2 * max_workers:
+                debate_list = claim_debates(conn, worker_id, batch_size, filters, lease_seconds)
+                if debate_list:
+                    print(f"[{worker_id}] Claimed {len(debate_list)} debates ({scheduler.in_flight} jobs in flight)")
+                    process_debates(conn, scheduler, debate_list)
+                    continue
+                exhausted = True
 
-        print(f"Found {len(debate_list)} unanalysed debates. Processing...")
-        process_debates(conn, debate_list)
+            if scheduler.in_flight == 0:
+                break
+            scheduler.collect(timeout=5)
 
-        analysis_pass +=1
+            if time.monotonic() - last_renewal > lease_seconds / 3:
+                scheduler.renew()
+                last_renewal = time.monotonic()
+    finally:
+        # Hand anything unfinished straight back rather than waiting for the leases to lapse
+        release_leases(conn, worker_id, list(scheduler.debates))
+        scheduler.shutdown()
+        conn.close()
 
+    print(f"[{worker_id}] analysed {scheduler.completed} debates")
+    if scheduler.failed_debates:
+        print(f"{len(scheduler.failed_debates)} debates had failed contributions and were left unanalysed")
+    print("All debates processed.")
+    if scheduler.triage:
+        print(scheduler.triage.report())
+    print(get_gateway().report())
+    stats = get_cache_stats()
+    print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate)")
 
-def process_debates(conn, debates: List[Dict]):
-    """ Processes each debate to extract contributions and generate points. """
-    debate_titles = [debate['title'] for debate in debates]
-    debate_ids = [debate['ext_id'] for debate in debates]
-    for i, (debate_ext_id, debate_title) in enumerate(zip(debate_ids, debate_titles)):
-        print(f"Processing debate {i + 1}/{len(debates)}: {debate_title} (ID: {debate_ext_id})")
-        point_list = process_debate(conn, debate_ext_id, debate_title)
-        if point_list:
-            save_points(conn, point_list)
-        # Mark debate as analysed
-        mark_as_analysed(conn, debate_ext_id)
 
-def process_debate_sequential(debate_title, contributions):
-    point_list = []
-    for i, contribution in enumerate(contributions):
-        if i % ((len(contributions) // 5) + 1) == 0:
-            print(f"Processing contribution {i+1}/{len(contributions)} in debate {debate_title}", flush=True)
-        past_contribution = contributions[i-1] if i > 0 else None
-        if not check_contribution(contribution):
-            continue
-        current_prompt = prepare_prompt(debate_title, contribution, past_contribution)
-        points = extract_points(current_prompt)
-        if points:
-            for point in points:
-                embedding = embed(point)
-                point_list.append((contribution['item_id'], point, embedding))
-    return point_list
+def process_debates(conn, scheduler: PointScheduler, debates: List[Dict]):
+    """ Queues every contribution of each debate on the scheduler. """
+    for debate in debates:
+        contributions = fetch_contributions(conn, debate['ext_id'])
+        if not contributions:
+            print(f"No contributions found for debate {debate['ext_id']}.")
+        scheduler.submit_debate(debate['ext_id'], debate['title'], contributions)
 
-def process_debate_parallel(debate_title, contributions, max_workers=5):
-    def process_chunk(chunk):
-        return process_debate_sequential(debate_title, chunk)
 
-    chunk_size = max(1, len(contributions) // max_workers)
-    chunks = [contributions[i:i+chunk_size] for i in range(0, len(contributions), chunk_size)]
-    point_list = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(process_chunk, chunk) for chunk in chunks]
-        for future in concurrent.futures.as_completed(futures):
-            point_list.extend(future.result())
-    return point_list
+def main():
+    parser = argparse.ArgumentParser(description="Generate points for unanalysed debates.")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to run on this machine")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--max-workers", type=int, default=16, help="concurrent LLM calls per process")
+    parser.add_argument("--house", default="Commons")
+    parser.add_argument("--start-date")
+    parser.add_argument("--end-date")
+    parser.add_argument("--no-pack", action="store_true", help="one LLM request per contribution")
+    parser.add_argument("--no-triage", action="store_true", help="send every valid contribution to the LLM")
+    args = parser.parse_args()
 
-def process_debate(conn, debate_ext_id: str, debate_title: str, parallel_threshold=5):
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT item_id, contribution_value, attributed_to, member_id, contribution_type
-        FROM contribution
-        WHERE debate_ext_id = %s
-        ORDER BY order_in_section ASC;
-    """, (debate_ext_id,))
-    result = cursor.fetchall()
-    cursor.close()
-    cols = [descr[0] for descr in cursor.description]
-    contributions = [dict(zip(cols, row)) for row in result]
-    if not contributions:
-        print(f"No contributions found for debate {debate_ext_id}. Skipping.")
-        return []
+    filters = {"house": args.house}
+    if args.start_date:
+        filters["start_date"] = args.start_date
+    if args.end_date:
+        filters["end_date"] = args.end_date
+    kwargs = {"batch_size": args.batch_size, "filters": filters, "max_workers": args.max_workers,
+              "pack": not args.no_pack, "triage": not args.no_triage}
 
-    print(f"Processing {len(contributions)} contributions for debate {debate_ext_id}")
-    if len(contributions) >= parallel_threshold:
-        return process_debate_parallel(debate_title, contributions)
-    else:
-        return process_debate_sequential(debate_title, contributions)
+    if args.processes == 1:
+        generate_points(**kwargs)
+        return
+    processes = [multiprocessing.Process(target=generate_points, kwargs=kwargs) for _ in range(args.processes)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
 
 
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
 import psycopg2
 
-def insert_point(conn: psycopg2.extensions.connection, contribution_item_id: str, point_value: str, point_embedding: list) -> None:
-    """ Saves a point to the database. """
+from .embed import compact_embedding
+
+def insert_point(conn: psycopg2.extensions.connection, contribution_item_id: str, point_value: str, point_embedding: list) -> int:
+    """ Saves a point to the database, with the compact fp16 copy of its embedding used for clustering. Returns its point_id. """
     cursor = conn.cursor()
     cursor.execute("""
-        INSERT INTO point (contribution_item_id, point_value, point_embedding)
-        VALUES (%s, %s, %s);
-    """, (contribution_item_id, point_value, point_embedding))
-    cursor.close()
\ No newline at end of file
+        INSERT INTO point (contribution_item_id, point_value, point_embedding, emb256_f16)
+        VALUES (%s, %s, %s, %s)
+        RETURNING point_id;
+    """, (contribution_item_id, point_value, point_embedding, compact_embedding(point_embedding)))
+    point_id = cursor.fetchone()[0]
+    cursor.close()
+    return point_id
\ No newline at end of file
@@ -63,3 +63,47 @@ I call the shadow Minister.
 []
 """
 
+
+# Packed mode: several target contributions from one debate per request, answered as a JSON object keyed by ID
+packed_system_prompt ="""
+/system
+
+You are a professional research assistant and your job is to help 
+me prepare a nice and clean datasets of arguments, positions and concerns. 
+
+The context is that we are reviewing parliamentary debates, questions, bills. 
+I'm going to give you several contributions made by speakers in the commons, in the order they were made, each marked with an ID. Where a contribution does not follow on from the one before it, I will provide its prior contribution as context.
+
+For each target contribution, extract the positions about political issues it makes, concise and easy to read. Where a contribution involves a department/organisation/location add this to the concise summary if the argument specifically targets these things. Each summary should be complete so that someone reading it understands what topic it is.
+
+Please return a well-formatted JSON object with one key per contribution ID, whose value is a JSON list of strings (an empty list if the contribution makes no argument). Don't return anything except for the json.
+
+/human
+
+# Debate Name: Neighbourhood Policing
+
+## Prior Contribution:
+Speaker: Peter Swallow  
+
+What recent progress her Department has made on improving neighbourhood policing in Bracknell Forest.
+
+## Target Contribution [ID 101]:
+Speaker: Matt Western 
+
+What recent progress her Department has made on improving neighbourhood policing. (904424)
+
+## Target Contribution [ID 102]:
+Speaker: Mr Speaker
+
+I call the Minister.
+
+## Target Contribution [ID 103]:
+Speaker: Yvette Cooper 
+
+Too many areas are facing the blight of off-road bikes and street racing. At the moment, the police have to give people multiple warnings. That is not good enough. We want to make it much easier for the police, so that it is one strike and out.
+
+/ai
+{"101": ["wants to know about progress made on improving neighbourhood policing"],
+"102": [],
+"103": ["off-road bikes and street racing are a concern", "Police should have one strike and out powers for people street-racing and using off-road bikes"]}
+"""
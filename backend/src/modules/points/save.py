@@ -1,10 +1,92 @@
-from typing import List, Dict
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from ..data.bulk import report_load
+from .bulk import copy_points
 from .insert import insert_point
-def save_points(conn, points: List[Dict]) -> None:
-    """ Saves points to the database. """
-    for point in points:
-        try:
-            insert_point(conn, point[0], point[1], point[2])
-        except Exception as e:
-            print(f"Error inserting point for contribution item {point['contribution_item_id']}: {e}")
-    conn.commit()
\ No newline at end of file
+
+logger = logging.getLogger(__name__)
+
+
+def _copy_points_or_none(conn, points: List[Tuple[str, str, list]]) -> Optional[List[int]]:
+    """ Runs the binary COPY inside a savepoint. On failure rolls back to it so the row-by-row path can run. """
+    cursor = conn.cursor()
+    cursor.execute("SAVEPOINT bulk_points;")
+    try:
+        point_ids = copy_points(conn, points)
+        cursor.execute("RELEASE SAVEPOINT bulk_points;")
+        return point_ids
+    except Exception as e:
+        logger.warning(f"Bulk point load failed, falling back to row-by-row inserts: {e}")
+        cursor.execute("ROLLBACK TO SAVEPOINT bulk_points;")
+        return None
+    finally:
+        cursor.close()
+
+def save_points(conn, points: List[Tuple[str, str, list]], bulk: bool = True, commit: bool = True) -> List[Optional[int]]:
+    """
+    Saves (contribution_item_id, point_value, embedding) tuples to the database.
+    Returns the new point_ids in input order (None where a row-by-row insert failed).
+    """
+    if not points:
+        # Still commit: callers like save_contribution_points rely on it for work done before the call
+        if commit:
+            conn.commit()
+        return []
+    point_ids = _copy_points_or_none(conn, points) if bulk else None
+    if point_ids is None:
+        t0 = time.perf_counter()
+        point_ids = []
+        cursor = conn.cursor()
+        for point in points:
+            cursor.execute("SAVEPOINT point_row;")
+            try:
+                point_ids.append(insert_point(conn, point[0], point[1], point[2]))
+                cursor.execute("RELEASE SAVEPOINT point_row;")
+            except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT point_row;")
+                point_ids.append(None)
+                print(f"Error inserting point for contribution item {point[0]}: {e}")
+        cursor.close()
+        inserted = sum(pid is not None for pid in point_ids)
+        report_load("point", len(points), inserted, time.perf_counter() - t0, "row")
+    if commit:
+        conn.commit()
+    return point_ids
+
+def save_contribution_points(conn, contribution_item_id: str, points: List) -> bool:
+    """
+    Checkpoints one contribution: its points and its `points_extracted_at` marker commit together.
+    Returns False (and writes nothing) if the contribution was already checkpointed, e.g. by
+    another worker that picked the debate up after a lease expired.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE contribution
+        SET points_extracted_at = now()
+        WHERE item_id = %s AND points_extracted_at IS NULL;
+    """, (contribution_item_id,))
+    claimed = cursor.rowcount == 1
+    cursor.close()
+    if not claimed:
+        conn.rollback()
+        return False
+    save_points(conn, points)
+    return True
+
+def save_skipped_contributions(conn, skipped: List[Tuple[str, str]]) -> None:
+    """ Checkpoints contributions triaged out before the LLM, recording why, so reruns don't triage them again. """
+    if not skipped:
+        return
+    from psycopg2.extras import execute_values
+    cursor = conn.cursor()
+    execute_values(cursor, """
+        UPDATE contribution AS c
+        SET points_extracted_at = now(), skip_reason = v.reason
+        FROM (VALUES %s) AS v(item_id, reason)
+        WHERE c.item_id = v.item_id AND c.points_extracted_at IS NULL;
+    """, skipped)
+    cursor.close()
+    conn.commit()
+
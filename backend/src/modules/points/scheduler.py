@@ -0,0 +1,157 @@
+# modules/points/scheduler.py
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from .embed import embed_batch
+from .extract import extract_points, extract_points_packed
+from .save import save_contribution_points, save_skipped_contributions
+from .triage import Triage
+from .utils import (check_contribution, prepare_prompt, prepare_packed_prompt, pack_contributions,
+                    mark_as_analysed, renew_leases)
+
+logger = logging.getLogger(__name__)
+
+
+def process_pack(title: str, pack: List[Tuple[Dict, Optional[Dict]]]) -> List[Tuple[str, List[Tuple[str, str, list]]]]:
+    """
+    One unit of LLM work: extract the points of a pack of contributions - in one request when
+    there are several, falling back to one request each if the packed response is unusable -
+    then embed all of them in one batch. Returns [(item_id, [(item_id, point, embedding)])].
+    Raises if any point failed to embed, so the pack is not checkpointed and is redone later.
+    """
+    item_ids = [contribution['item_id'] for contribution, _ in pack]
+    extracted = None
+    if len(pack) > 1:
+        extracted = extract_points_packed(prepare_packed_prompt(title, pack), item_ids)
+    if extracted is None:
+        extracted = {contribution['item_id']: extract_points(prepare_prompt(title, contribution, past_contribution))
+                     for contribution, past_contribution in pack}
+
+    texts = [point for item_id in item_ids for point in extracted[item_id]]
+    vectors = embed_batch(texts) if texts else []
+    failed = sum(v is None for v in vectors)
+    if failed:
+        raise RuntimeError(f"{failed}/{len(vectors)} point embeddings failed for contributions {item_ids}")
+    embeddings = iter(vectors)
+    return [(item_id, [(item_id, point, next(embeddings)) for point in extracted[item_id]]) for item_id in item_ids]
+
+
+class DebateProgress:
+    def __init__(self, ext_id: str, title: str):
+        self.ext_id = ext_id
+        self.title = title
+        self.pending = 0
+        self.failed = False
+        self.n_points = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+
+
+class PointScheduler:
+    """
+    Schedules contribution-level extraction jobs from many debates onto one pool with a
+    global concurrency cap, so a slow contribution only occupies one worker. With `pack`,
+    runs of short contributions share one request (see pack_contributions). With `triage`,
+    contributions it rejects are checkpointed with their skip reason and never sent.
+
+    Workers only call the LLM and the embedder. All database writes happen on the thread
+    that calls `collect`, which owns `conn`: each contribution's points are committed
+    (checkpointed) as its job completes, and when the last job of a debate completes the
+    debate's lease is re-checked and it is marked analysed.
+    """
+
+    def __init__(self, conn, worker_id: str, max_workers: int = 16, lease_seconds: int = 900, pack: bool = True,
+                 triage: Optional[Triage] = None):
+        self.conn = conn
+        self.pack = pack
+        self.triage = triage
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="points")
+        self.jobs: Dict[Future, str] = {}
+        self.debates: Dict[str, DebateProgress] = {}
+        self.failed_debates: set = set()
+        self.completed = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self.jobs)
+
+    def renew(self) -> None:
+        """ Extends the leases on every debate still in progress. """
+        renew_leases(self.conn, self.worker_id, list(self.debates), self.lease_seconds)
+
+    def submit_debate(self, ext_id: str, title: str, contributions: List[Dict]) -> None:
+        progress = DebateProgress(ext_id, title)
+        self.debates[ext_id] = progress
+        items, done = [], []
+        for i, contribution in enumerate(contributions):
+            if contribution.get('points_extracted_at'):
+                progress.skipped += 1  # checkpointed by an earlier, interrupted run
+                done.append(contribution)
+                continue
+            if not check_contribution(contribution):
+                continue
+            items.append((contribution, contributions[i - 1] if i > 0 else None))
+        packs = self._packs(items)
+        if self.triage:
+            kept, skipped = self.triage.filter(items, done)
+            save_skipped_contributions(self.conn, skipped)
+            packs_kept = self._packs(kept)
+            self.triage.calls_saved += len(packs) - len(packs_kept)
+            packs = packs_kept
+        for pack in packs:
+            future = self.executor.submit(process_pack, title, pack)
+            self.jobs[future] = ext_id
+            progress.pending += 1
+        if progress.pending == 0:
+            self._finish(progress)
+
+    def _packs(self, items: List[Tuple[Dict, Optional[Dict]]]) -> List[List[Tuple[Dict, Optional[Dict]]]]:
+        return pack_contributions(items) if self.pack else [[item] for item in items]
+
+    def collect(self, timeout: float = None) -> int:
+        """ Waits for at least one job (or the timeout), handles everything finished. Returns debates completed. """
+        if not self.jobs:
+            return 0
+        done, _ = wait(list(self.jobs), timeout=timeout, return_when=FIRST_COMPLETED)
+        finished = 0
+        for future in done:
+            progress = self.debates[self.jobs.pop(future)]
+            progress.pending -= 1
+            try:
+                for item_id, points in future.result():
+                    if save_contribution_points(self.conn, item_id, points):
+                        progress.n_points += len(points)
+            except Exception as e:
+                logger.error(f"Contribution job failed in debate {progress.ext_id}: {e}")
+                self.conn.rollback()
+                progress.failed = True
+            if progress.pending == 0:
+                self._finish(progress)
+                finished += 1
+        return finished
+
+    def _finish(self, progress: DebateProgress) -> None:
+        del self.debates[progress.ext_id]
+        if progress.failed:
+            # Finished contributions are already checkpointed; the lease lapses and whoever
+            # picks the debate up next only redoes the failed ones
+            self.failed_debates.add(progress.ext_id)
+            logger.warning(f"Debate {progress.ext_id} had failed contributions; leaving it unanalysed")
+            return
+        # If the lease expired and another worker claimed the debate, let them finish it
+        if not renew_leases(self.conn, self.worker_id, [progress.ext_id], self.lease_seconds):
+            logger.warning(f"Lost the lease on debate {progress.ext_id}; leaving it to its new owner")
+            return
+        mark_as_analysed(self.conn, progress.ext_id)
+        self.completed += 1
+        logger.info(f"Debate {progress.title} ({progress.ext_id}): {progress.n_points} points "
+                    f"({progress.skipped} contributions resumed from checkpoint) "
+                    f"in {time.perf_counter() - progress.started:.1f}s")
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,98 @@
+# modules/points/triage.py
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Contributions with fewer words than this are never worth an LLM call
+TRIAGE_MIN_WORDS = int(os.getenv("POINTS_TRIAGE_MIN_WORDS", "4"))
+# Procedural phrases only skip a contribution up to this many words; longer ones carry substance
+TRIAGE_PROCEDURAL_MAX_WORDS = int(os.getenv("POINTS_TRIAGE_PROCEDURAL_MAX_WORDS", "25"))
+
+# Chamber business with no argument in it, matched at the start of a (short) contribution
+PROCEDURAL_PATTERNS = [
+    r"i beg to move",
+    r"order[.!,]?( order[.!]?)*$",
+    # The Chair calling the next speaker, not "I call this a betrayal..."
+    r"i call (the )?(next|hon\.?|right hon\.?|honourable|minister|shadow|chair(man|woman)?|father|mother|"
+    r"sir|dame|dr|mr|mrs|ms|miss|lord|lady|baroness)\b",
+    r"on a point of order,? (mr|madam) (deputy )?speaker[.!]?$",
+    r"(that is|this is) not a point of order",
+    r"the question is,? that\b",
+    r"question (put|agreed to|accordingly agreed to|negatived)",
+    r"(the )?ayes (have it|to the right)",
+    r"(the )?noes (have it|to the left)",
+    r"the house divided",
+    r"(clear the lobby|lock the doors)",
+    # Stage directions: "Several hon. Members rose—", "Jim Shannon rose—", "Hon. Members indicated dissent."
+    r"((several |some )?(right )?(hon\.? )?members? )?(rose|indicated (assent|dissent))[\s.—–-]*$",
+    r"[^.?!]{1,80} rose\s*[—–-]+\s*$",
+    r"(bill|motion|amendment) (read|made|agreed|withdrawn)",
+    r"(with (your )?permission,? mr speaker,? )?i will answer (this question|questions? \d+)",
+    r"(topical questions?|\d+\.?)$",
+]
+PROCEDURAL_RE = re.compile(r"^\s*(?:" + "|".join(PROCEDURAL_PATTERNS) + r")", re.IGNORECASE)
+
+_QUESTION_NUMBER_RE = re.compile(r"\(\s*\d{4,}\s*\)")
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+
+
+def normalise(text: str) -> str:
+    """ Text used for duplicate detection: lower case, no question numbers, punctuation or extra spaces. """
+    text = _QUESTION_NUMBER_RE.sub(" ", text.lower())
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+class Triage:
+    """
+    Cheap pre-LLM filter for contributions that passed check_contribution. Skips very short
+    contributions, procedural chamber business and verbatim repeats within a debate (including
+    ones checkpointed by an earlier run), and counts why, so each run can report how many LLM
+    calls it saved.
+    """
+
+    def __init__(self, min_words: int = TRIAGE_MIN_WORDS, procedural_max_words: int = TRIAGE_PROCEDURAL_MAX_WORDS):
+        self.min_words = min_words
+        self.procedural_max_words = procedural_max_words
+        self.reasons: Counter = Counter()
+        self.kept = 0
+        self.calls_saved = 0
+
+    def skip_reason(self, contribution: Dict, seen: set) -> Optional[str]:
+        """ Returns why a contribution should be skipped, or None to send it to the LLM. """
+        text = contribution['contribution_value']
+        n_words = len(text.split())
+        if n_words < self.min_words:
+            return "too_short"
+        if n_words <= self.procedural_max_words and PROCEDURAL_RE.match(text):
+            return "procedural"
+        key = normalise(text)
+        if key in seen:
+            return "duplicate"
+        seen.add(key)
+        return None
+
+    def filter(self, items: List[Tuple[Dict, Optional[Dict]]], done: Iterable[Dict] = ()
+               ) -> Tuple[List[Tuple[Dict, Optional[Dict]]], List[Tuple[str, str]]]:
+        """
+        Splits one debate's (contribution, past_contribution) pairs into (kept, [(item_id, reason)]).
+        `done` are the debate's already-checkpointed contributions: repeats of them are duplicates too.
+        """
+        kept, skipped = [], []
+        seen = {normalise(c['contribution_value']) for c in done if c.get('contribution_value')}
+        for contribution, past_contribution in items:
+            reason = self.skip_reason(contribution, seen)
+            if reason:
+                skipped.append((contribution['item_id'], reason))
+                self.reasons[reason] += 1
+            else:
+                kept.append((contribution, past_contribution))
+        self.kept += len(kept)
+        return kept, skipped
+
+    def report(self) -> str:
+        skipped = sum(self.reasons.values())
+        total = skipped + self.kept
+        by_reason = ", ".join(f"{reason}: {n}" for reason, n in self.reasons.most_common()) or "none"
+        return (f"Triage: skipped {skipped}/{total} contributions ({by_reason}); "
+                f"{self.calls_saved} LLM calls saved")
@@ -1,5 +1,12 @@
+import os
 import re
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+
+# Packed extraction: contributions longer than PACK_ITEM_MAX_TOKENS always go alone; a pack
+# holds at most PACK_MAX_ITEMS contributions and PACK_MAX_TOKENS of contribution text
+PACK_MAX_TOKENS = int(os.getenv("POINTS_PACK_MAX_TOKENS", "1500"))
+PACK_MAX_ITEMS = int(os.getenv("POINTS_PACK_MAX_ITEMS", "8"))
+PACK_ITEM_MAX_TOKENS = int(os.getenv("POINTS_PACK_ITEM_MAX_TOKENS", "300"))
 
 def clean_llm_response(response: str) -> str:
     """
@@ -41,6 +48,69 @@ def check_contribution(contribution)-> bool:
         return False
     return True
 
+def clean_llm_json_object(response: str) -> str:
+    """ Like clean_llm_response, but extracts the outermost JSON object (for packed responses). """
+    cleaned_response = re.sub(r'```(?:json)?', '', response)
+    json_match = re.search(r'\{.*\}', cleaned_response, re.DOTALL)
+    if json_match:
+        cleaned_response = json_match.group(0)
+    return cleaned_response.strip()
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """ Cheap upper-ish bound (~4 chars per token) - good enough for packing requests. """
+    return len(text or "") // 4 + 1
+
+def _needs_prior(past_contribution: Optional[Dict], previous_id: Optional[str]) -> bool:
+    """ Whether a packed prompt repeats the prior contribution: not when it is the pack's previous target. """
+    return past_contribution is not None and past_contribution['item_id'] != previous_id
+
+def pack_contributions(items: List[Tuple[Dict, Optional[Dict]]], max_tokens: int = PACK_MAX_TOKENS,
+                       max_items: int = PACK_MAX_ITEMS, item_max_tokens: int = PACK_ITEM_MAX_TOKENS) -> List[List[Tuple[Dict, Optional[Dict]]]]:
+    """
+    Groups (contribution, past_contribution) pairs, in speaking order, into packs for one request each.
+    Short contributions are packed together up to the token and item budgets, counting the prior
+    contributions prepare_packed_prompt will include; long ones get a pack of their own.
+    """
+    packs, pack, tokens = [], [], 0
+    for contribution, past_contribution in items:
+        t = estimate_tokens(contribution['contribution_value'])
+        if t > item_max_tokens:
+            # Close the open pack first so packs stay in speaking order
+            if pack:
+                packs.append(pack)
+                pack, tokens = [], 0
+            packs.append([(contribution, past_contribution)])
+            continue
+        previous_id = pack[-1][0]['item_id'] if pack else None
+        prior = estimate_tokens(past_contribution['contribution_value']) if _needs_prior(past_contribution, previous_id) else 0
+        if pack and (len(pack) >= max_items or tokens + t + prior > max_tokens):
+            packs.append(pack)
+            pack, tokens = [], 0
+            prior = estimate_tokens(past_contribution['contribution_value']) if past_contribution else 0
+        pack.append((contribution, past_contribution))
+        tokens += t + prior
+    if pack:
+        packs.append(pack)
+    return packs
+
+def prepare_packed_prompt(debate_title: str, pack: List[Tuple[Dict, Optional[Dict]]]) -> str:
+    """
+    Prepares one prompt for several contributions, each labelled with its item_id. A prior
+    contribution is only included where it is not already the previous target in the pack.
+    """
+    sections = [f"# Debate Name: {debate_title}\n"]
+    previous_id = None
+    for contribution, past_contribution in pack:
+        if _needs_prior(past_contribution, previous_id):
+            sections.append("## Prior Contribution:\n"
+            f"Speaker: {past_contribution['attributed_to']}\n"
+            f"{past_contribution['contribution_value']}\n")
+        sections.append(f"## Target Contribution [ID {contribution['item_id']}]:\n"
+        f"Speaker: {contribution['attributed_to']}\n"
+        f"{contribution['contribution_value']}\n")
+        previous_id = contribution['item_id']
+    return "\n".join(sections)
+
 def prepare_prompt(debate_title: str, contribution: Dict, past_contribution: Dict = None) -> str:
     """ Prepares the prompt for LLM analysis based on the contribution and past contribution. """
     prior_section = ""
@@ -119,12 +189,117 @@ def fetch_unanalysed_debates(conn, batch_size, filters: Dict = {"house": "Common
     
     return [{"ext_id": row[0], "title": row[1]} for row in results]
 
+def ensure_generation_columns(conn) -> None:
+    """ Idempotently adds the work-queue, checkpoint and compact-embedding columns to databases created before them. """
+    cursor = conn.cursor()
+    cursor.execute("""
+        ALTER TABLE point ADD COLUMN IF NOT EXISTS emb256_f16 BYTEA;
+        ALTER TABLE debate ADD COLUMN IF NOT EXISTS lease_owner TEXT;
+        ALTER TABLE debate ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+        ALTER TABLE contribution ADD COLUMN IF NOT EXISTS points_extracted_at TIMESTAMPTZ;
+        ALTER TABLE contribution ADD COLUMN IF NOT EXISTS skip_reason TEXT;
+    """)
+    cursor.close()
+    conn.commit()
+
+def claim_debates(conn, worker_id: str, batch_size: int, filters: Dict = {"house": "Commons"}, lease_seconds: int = 900) -> List[Dict]:
+    """
+    Leases up to batch_size unanalysed debates to `worker_id` and returns them.
+    FOR UPDATE SKIP LOCKED lets concurrent workers claim disjoint batches without blocking,
+    and debates whose lease has expired (e.g. their worker crashed) become claimable again.
+    """
+    cursor = conn.cursor()
+    query = """
+        WITH claimable AS (
+            SELECT ext_id
+            FROM debate
+            WHERE analysed IS FALSE
+            AND house = %s
+            AND (lease_expires_at IS NULL OR lease_expires_at < now())
+            AND EXISTS (
+                SELECT 1
+                FROM contribution
+                WHERE debate_ext_id = debate.ext_id AND member_id IS NOT NULL
+            )
+    """
+    params = [filters.get("house", "Commons")]
+
+    if filters.get("start_date"):
+        query += " AND date >= %s"
+        params.append(filters["start_date"])
+
+    if filters.get("end_date"):
+        query += " AND date <= %s"
+        params.append(filters["end_date"])
+
+    query += """
+            ORDER BY ext_id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE debate d
+        SET lease_owner = %s, lease_expires_at = now() + make_interval(secs => %s)
+        FROM claimable c
+        WHERE d.ext_id = c.ext_id
+        RETURNING d.ext_id, d.title;
+    """
+    params.extend([batch_size, worker_id, lease_seconds])
+
+    cursor.execute(query, params)
+    results = cursor.fetchall()
+    cursor.close()
+    conn.commit()
+    return [{"ext_id": row[0], "title": row[1]} for row in sorted(results)]
+
+def renew_leases(conn, worker_id: str, debate_ext_ids: List[str], lease_seconds: int = 900) -> List[str]:
+    """ Extends this worker's leases. Returns the debates it still holds - any others were lost to expiry. """
+    if not debate_ext_ids:
+        return []
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE debate
+        SET lease_expires_at = now() + make_interval(secs => %s)
+        WHERE ext_id = ANY(%s) AND lease_owner = %s AND analysed IS FALSE
+        RETURNING ext_id;
+    """, (lease_seconds, list(debate_ext_ids), worker_id))
+    held = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    conn.commit()
+    return held
+
+def release_leases(conn, worker_id: str, debate_ext_ids: List[str]) -> None:
+    """ Hands unfinished debates back to the queue immediately, e.g. on shutdown. """
+    if not debate_ext_ids:
+        return
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE debate
+        SET lease_owner = NULL, lease_expires_at = NULL
+        WHERE ext_id = ANY(%s) AND lease_owner = %s;
+    """, (list(debate_ext_ids), worker_id))
+    cursor.close()
+    conn.commit()
+
+def fetch_contributions(conn, debate_ext_id: str) -> List[Dict]:
+    """ Fetches a debate's contributions in speaking order, with their checkpoint state. """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT item_id, contribution_value, attributed_to, member_id, contribution_type, points_extracted_at
+        FROM contribution
+        WHERE debate_ext_id = %s
+        ORDER BY order_in_section ASC;
+    """, (debate_ext_id,))
+    result = cursor.fetchall()
+    cols = [descr[0] for descr in cursor.description]
+    cursor.close()
+    return [dict(zip(cols, row)) for row in result]
+
 def mark_as_analysed(conn, debate_ext_id: str):
     """ Marks a debate as analysed in the database. """
     cursor = conn.cursor()
     cursor.execute("""
         UPDATE debate
-        SET analysed = TRUE
+        SET analysed = TRUE, lease_owner = NULL, lease_expires_at = NULL
         WHERE ext_id = %s;
     """, (debate_ext_id,))
     cursor.close()
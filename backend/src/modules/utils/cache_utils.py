@@ -0,0 +1,55 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FOREVER = float("inf")
+
+
+def cache_key(*parts: Any) -> str:
+    """Content address for a request: sha256 over the canonical JSON of its parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Gzip-compressed JSON files under `root`, one per key, sharded by the first two
+    hex pairs of the key. Writes go to a temp file and are renamed into place, so
+    concurrent readers (threads or processes) only ever see complete entries.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key + ".json.gz")
+
+    def get(self, key: str, ttl: float = FOREVER) -> Tuple[bool, Any]:
+        """Returns (hit, value). Entries older than `ttl` seconds count as misses."""
+        path = self.path_for(key)
+        try:
+            if ttl != FOREVER and time.time() - os.path.getmtime(path) > ttl:
+                return False, None
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return True, json.load(f)["value"]
+        except FileNotFoundError:
+            return False, None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return False, None
+
+    def put(self, key: str, value: Any, **meta) -> None:
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump({**meta, "stored_at": time.time(), "value": value}, f)
+        os.replace(tmp, path)
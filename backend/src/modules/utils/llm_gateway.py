@@ -0,0 +1,181 @@
+# modules/utils/llm_gateway.py
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from groq import APIConnectionError, Groq
+
+from .cache_utils import DiskCache, cache_key
+from .rate_utils import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+# Concurrent requests per process, and the token budget they share
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "250000"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "5"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "1.0"))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "commontalk", "llm"))
+# readwrite: serve repeats from the cache and record new responses
+# replay: offline stand-in, answer only from recorded responses
+# off: always call the provider
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "readwrite").lower()
+LLM_CACHE_MODES = {"readwrite", "replay", "off"}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Completion budget assumed when a call doesn't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 1024
+
+
+class ReplayMiss(RuntimeError):
+    """ Raised in replay mode when a request has no recorded response. """
+
+
+def _estimate_tokens(messages: List[Dict]) -> int:
+    return sum(len(m.get("content") or "") for m in messages) // 4 + 1
+
+
+def _status_of(e: Exception) -> Optional[int]:
+    status = getattr(e, "status_code", None)
+    if status is None and getattr(e, "response", None) is not None:
+        status = getattr(e.response, "status_code", None)
+    return status
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    response = getattr(e, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class LLMGateway:
+    """
+    The one way this codebase talks to the chat-completions API. Holds a single client
+    per process, caps concurrent requests, paces them against a tokens-per-minute budget,
+    retries 429s and 5xx with jittered backoff (honouring Retry-After), caches responses by
+    a hash of the request and records latency and token usage per `tag`.
+    """
+
+    def __init__(self, model: str = LLM_MODEL, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 tokens_per_minute: int = LLM_TOKENS_PER_MINUTE, retries: int = LLM_RETRIES,
+                 backoff: float = LLM_BACKOFF, cache_dir: str = LLM_CACHE_DIR, cache_mode: str = LLM_CACHE_MODE):
+        if cache_mode not in LLM_CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode {cache_mode!r}; expected one of {sorted(LLM_CACHE_MODES)}")
+        self.model = model
+        self.retries = retries
+        self.backoff = backoff
+        self.cache_mode = cache_mode
+        self.cache = DiskCache(cache_dir) if cache_mode != "off" else None
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._budget = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) if tokens_per_minute > 0 else None
+        self._client = None
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                # Retries are ours, so the SDK's own are turned off
+                self._client = Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+        return self._client
+
+    def _record(self, tag: str, **values) -> None:
+        with self._lock:
+            m = self._metrics[tag]
+            for k, v in values.items():
+                m[k] += v
+            if "latency" in values:
+                m["max_latency"] = max(m["max_latency"], values["latency"])
+
+    def complete(self, messages: List[Dict], tag: str = "default", refresh: bool = False, **params) -> str:
+        """
+        Returns the content of one chat completion for `messages`. `params` (temperature,
+        top_p, max_tokens, ...) are passed through and are part of the cache key. `refresh`
+        skips the cache lookup - e.g. to retry an unusable response - and re-records it.
+        """
+        params.setdefault("model", self.model)
+        key = cache_key(messages, params)
+        if self.cache and (not refresh or self.cache_mode == "replay"):
+            hit, value = self.cache.get(key)
+            if hit:
+                self._record(tag, calls=1, cache_hits=1)
+                return value
+        if self.cache_mode == "replay":
+            self._record(tag, calls=1, errors=1)
+            raise ReplayMiss(f"No recorded LLM response for this {tag} request (LLM_CACHE_MODE=replay)")
+
+        content = self._call(messages, tag, params)
+        if self.cache:
+            self.cache.put(key, content, model=params["model"], tag=tag)
+        return content
+
+    def _call(self, messages: List[Dict], tag: str, params: Dict) -> str:
+        tokens = _estimate_tokens(messages) + params.get("max_tokens", DEFAULT_COMPLETION_TOKENS)
+        for attempt in range(self.retries + 1):
+            if self._budget:
+                self._budget.acquire(tokens)
+            started = time.perf_counter()
+            try:
+                with self._slots:
+                    response = self.client().chat.completions.create(messages=messages, stream=False, **params)
+            except Exception as e:
+                status = _status_of(e)
+                retryable = status in RETRY_STATUS or isinstance(e, APIConnectionError)
+                if not retryable or attempt == self.retries:
+                    self._record(tag, calls=1, errors=1)
+                    raise
+                wait = _retry_after(e) or self.backoff * 2 ** attempt
+                wait *= random.uniform(0.5, 1.5)
+                logger.warning(f"LLM {tag} request failed ({status or type(e).__name__}); retrying in {wait:.1f}s")
+                self._record(tag, retries=1)
+                time.sleep(wait)
+                continue
+            usage = getattr(response, "usage", None)
+            self._record(tag, calls=1, latency=time.perf_counter() - started,
+                         prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                         completion_tokens=getattr(usage, "completion_tokens", 0) or 0)
+            return response.choices[0].message.content
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """ Per-tag counters: calls, cache_hits, retries, errors, prompt/completion tokens, latency. """
+        with self._lock:
+            return {tag: dict(m) for tag, m in self._metrics.items()}
+
+    def report(self) -> str:
+        lines = []
+        for tag, m in sorted(self.metrics().items()):
+            sent = m.get("calls", 0) - m.get("cache_hits", 0) - m.get("errors", 0)
+            mean = m.get("latency", 0) / sent if sent > 0 else 0.0
+            lines.append(f"LLM {tag}: {m.get('calls', 0):.0f} calls ({m.get('cache_hits', 0):.0f} cached, "
+                         f"{m.get('retries', 0):.0f} retries, {m.get('errors', 0):.0f} errors), "
+                         f"{m.get('prompt_tokens', 0):.0f} prompt + {m.get('completion_tokens', 0):.0f} completion tokens, "
+                         f"{mean:.2f}s mean / {m.get('max_latency', 0):.2f}s max latency")
+        return "\n".join(lines) or "LLM: no calls"
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """ The process-wide gateway, configured from LLM_* environment variables. """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+    return _gateway
+
+
+def configure_gateway(**kwargs) -> LLMGateway:
+    """ Replaces the process-wide gateway, e.g. configure_gateway(cache_mode="replay"). """
+    global _gateway
+    with _gateway_lock:
+        _gateway = LLMGateway(**kwargs)
+    return _gateway
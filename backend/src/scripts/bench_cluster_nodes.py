@@ -0,0 +1,64 @@
+# Benchmark: clustering one tree node with each engine in modules/cluster/engines.py.
+#
+#   python scripts/bench_cluster_nodes.py                         # 300 / 3k / 30k / 300k points, 256 dims
+#   python scripts/bench_cluster_nodes.py --sizes 500 5000 --clusters 5 --algorithm elkan
+#   python scripts/bench_cluster_nodes.py --engines minibatch full
+#
+# Nodes are random subsets of a synthetic fp16 store with --clusters planted clusters, read
+# through the same memmap the recursion uses. Inertia is comparable across engines (squared
+# euclidean to the assigned centroid); ARI is agreement with the full KMeans labels, as a
+# check that a faster engine isn't buying speed with worse splits.
+import argparse
+import os
+import tempfile
+
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+
+from modules.cluster.engines import ENGINES, fit
+
+DIMS = 256
+
+
+def synthetic_store(n: int, dims: int = DIMS, centres: int = 20):
+    rng = np.random.default_rng(0)
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "Xfp16.dat")
+    X = np.memmap(path, dtype=np.float16, mode="w+", shape=(n, dims))
+    C = rng.standard_normal((centres, dims)).astype(np.float32)
+    for s in range(0, n, 100_000):
+        m = min(100_000, n - s)
+        block = C[rng.integers(0, centres, m)] + 0.5 * rng.standard_normal((m, dims)).astype(np.float32)
+        X[s:s + m] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    X.flush()
+    return {"fp16_path": path, "N": n, "dims": dims}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 3_000, 30_000, 300_000])
+    parser.add_argument("--clusters", type=int, default=5)
+    parser.add_argument("--algorithm", default="lloyd", choices=["lloyd", "elkan"])
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    args = parser.parse_args()
+
+    scratch = synthetic_store(max(args.sizes) * 2, centres=args.clusters)
+    Xf16 = np.memmap(scratch["fp16_path"], dtype=np.float16, mode="r", shape=(scratch["N"], scratch["dims"]))
+    config = {"kmeans_algorithm": args.algorithm}
+    rng = np.random.default_rng(1)
+    # Warm-up, so no engine pays for sklearn's first-call overheads
+    for engine in args.engines:
+        fit(Xf16, np.arange(2_000), args.clusters, config, engine=engine)
+    print(f"{'points':>8} {'engine':>10} {'seconds':>9} {'inertia':>12} {'ARI':>6}")
+    for n in args.sizes:
+        idx = rng.choice(scratch["N"], size=n, replace=False)
+        reference = fit(Xf16, idx, args.clusters, config, engine="full").labels
+        for engine in args.engines:
+            result = fit(Xf16, idx, args.clusters, config, engine=engine)
+            ari = adjusted_rand_score(reference, result.labels)
+            print(f"{n:>8,} {engine:>10} {result.seconds:>9.3f} {result.inertia:>12.1f} {ari:>6.2f}")
+    os.remove(scratch["fp16_path"])
+
+
+if __name__ == "__main__":
+    main()
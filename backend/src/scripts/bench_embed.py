@@ -0,0 +1,39 @@
+# Benchmark: one embedding request per point vs batched requests, against the offline
+# stand-in backend with a simulated round trip.
+#
+#   python scripts/bench_embed.py [n_points] [latency_seconds]
+import os
+import sys
+import time
+
+os.environ.setdefault("EMBED_CACHE", "off")  # measure the provider path, not cache hits
+
+from modules.points.embed import LocalEmbeddingBackend, embed, embed_batch, set_backend
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    texts = [f"Point number {i} about the cost of living and local services" for i in range(n)]
+
+    backend = LocalEmbeddingBackend(latency=latency)
+    set_backend(backend)
+
+    t0 = time.perf_counter()
+    single = [embed(t) for t in texts]
+    t_single = time.perf_counter() - t0
+    single_requests = backend.requests
+
+    backend.requests = 0
+    t0 = time.perf_counter()
+    batched = embed_batch(texts)
+    t_batched = time.perf_counter() - t0
+
+    assert batched == single, "batched embeddings must match per-point embeddings, in input order"
+    print(f"{n} points, {latency * 1e3:.0f} ms simulated latency per request")
+    print(f"  per point : {single_requests:>5} requests, {n / t_single:>9.1f} points/sec")
+    print(f"  batched   : {backend.requests:>5} requests, {n / t_batched:>9.1f} points/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Micro-benchmark: single-pass extract_contributions vs the old backwards-scan attribution.
+#
+#   python scripts/bench_extract_contributions.py                 # synthetic debates
+#   python scripts/bench_extract_contributions.py ~/.cache/commontalk/http   # recorded debate JSONs
+#
+# Recorded debates are read from the Hansard response cache (*.json.gz) or plain *.json files.
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+from modules.data.utils import extract_contributions, find_most_recent_member_id_and_attribution
+
+
+def legacy_extract_contributions(debate_data):
+    """The previous implementation: a backwards scan for every unattributed paragraph."""
+    contributions = []
+    for i, contribution in enumerate(debate_data.get('Items', [])):
+        contribution_dict = {
+            "ext_id": contribution.get('ExternalId'),
+            "item_id": contribution.get('ItemId'),
+            "type": contribution.get('ItemType'),
+            "debate_section_ext_id": debate_data.get('Overview', {}).get('ExtId'),
+            "member_id": contribution.get('MemberId'),
+            "attributed_to": contribution.get('AttributedTo'),
+            "value": contribution.get('Value'),
+            "order_in_section": contribution.get('OrderInSection'),
+            "timecode": contribution.get('Timecode'),
+            "hrs_tag": contribution.get('HRSTag', None),
+        }
+        if contribution_dict["hrs_tag"] in ["hs_para", "hs_parafo", "hs_quotefo"] and not contribution_dict["member_id"]:
+            member_id, attribution = find_most_recent_member_id_and_attribution(debate_data, i)
+            if member_id:
+                contribution_dict["member_id"] = member_id
+                contribution_dict["attributed_to"] = attribution
+        contributions.append(contribution_dict)
+    return contributions
+
+
+def synthetic_debate(n_items: int, seed: int = 0):
+    """A debate where each speech opens with an attributed hs_para followed by unattributed paragraphs."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(n_items):
+        opens_speech = i == 0 or rng.random() < 0.02  # long speeches -> long backwards scans
+        items.append({
+            "ExternalId": f"ext-{i}",
+            "ItemId": i,
+            "ItemType": "Contribution",
+            "MemberId": rng.randint(1, 650) if opens_speech else None,
+            "AttributedTo": f"Member {i}" if opens_speech else None,
+            "Value": "Lorem ipsum " * 20,
+            "OrderInSection": i,
+            "Timecode": None,
+            "HRSTag": "hs_para" if opens_speech else rng.choice(["hs_para", "hs_parafo", "hs_quotefo"]),
+        })
+    return {"Overview": {"ExtId": "synthetic"}, "Items": items}
+
+
+def recorded_debates(root: str):
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(dirpath, name)
+            if name.endswith(".json.gz"):
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    body = json.load(f).get("value")
+            elif name.endswith(".json"):
+                with open(path, encoding="utf-8") as f:
+                    body = json.load(f)
+            else:
+                continue
+            if isinstance(body, dict) and body.get("Items"):
+                yield body
+
+
+def bench(fn, debate, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(debate)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    if len(sys.argv) > 1:
+        debates = sorted(recorded_debates(sys.argv[1]), key=lambda d: len(d["Items"]), reverse=True)[:20]
+        if not debates:
+            print(f"No recorded debates found under {sys.argv[1]}")
+            return
+    else:
+        debates = [synthetic_debate(n) for n in (500, 2000, 5000, 10000)]
+
+    print(f"{'items':>8} {'legacy (ms)':>12} {'single-pass (ms)':>17} {'speedup':>8}")
+    for debate in debates:
+        assert extract_contributions(debate) == legacy_extract_contributions(debate)
+        legacy = bench(legacy_extract_contributions, debate)
+        single = bench(extract_contributions, debate)
+        print(f"{len(debate['Items']):>8} {legacy * 1e3:>12.1f} {single * 1e3:>17.1f} {legacy / single:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Benchmark: clustering on the stored 256 dims vs a PCA / random-projection reduction.
+#
+#   python scripts/bench_reduce.py                              # 100k points, k=5, full + minibatch
+#   python scripts/bench_reduce.py --points 300000 --dims 64 32 16 --engine minibatch
+#
+# The synthetic store mimics sentence embeddings: cluster structure in a low-rank subspace
+# plus isotropic noise, rows unit-normalised. Each reduction is timed (fit + projecting the
+# store) separately from the clustering. Quality is judged in the original 256-dim space:
+# inertia of the labels against their 256-dim cluster means, and ARI against the labels
+# clustering on all 256 dims gives.
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+
+from modules.cluster.engines import fit
+from modules.cluster.reduce import _reduce_into
+
+DIMS = 256
+
+
+def synthetic_store(n: int, centres: int, rank: int = 24, dims: int = DIMS):
+    rng = np.random.default_rng(0)
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "Xfp16.dat")
+    X = np.memmap(path, dtype=np.float16, mode="w+", shape=(n, dims))
+    basis = np.linalg.qr(rng.standard_normal((dims, rank)))[0].T.astype(np.float32)
+    C = rng.standard_normal((centres, rank)).astype(np.float32)
+    for s in range(0, n, 100_000):
+        m = min(100_000, n - s)
+        latent = C[rng.integers(0, centres, m)] + 0.8 * rng.standard_normal((m, rank)).astype(np.float32)
+        block = latent @ basis + 0.15 * rng.standard_normal((m, dims)).astype(np.float32)
+        X[s:s + m] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    X.flush()
+    return tmp, path
+
+
+def original_inertia(Xf16: np.ndarray, labels: np.ndarray, k: int) -> float:
+    X = Xf16[:].astype(np.float32)
+    return sum(float(((X[labels == j] - X[labels == j].mean(axis=0)) ** 2).sum()) for j in range(k) if (labels == j).any())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--clusters", type=int, default=5)
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 32])
+    parser.add_argument("--engine", nargs="+", default=["full", "minibatch"])
+    args = parser.parse_args()
+
+    tmp, path = synthetic_store(args.points, args.clusters)
+    Xf16 = np.memmap(path, dtype=np.float16, mode="r", shape=(args.points, DIMS))
+    idx = np.arange(args.points)
+    fit(Xf16, idx[:2_000], args.clusters, {}, engine="full")  # warm-up
+
+    print(f"{'engine':>10} {'space':>10} {'reduce s':>9} {'cluster s':>10} {'speedup':>8} {'inertia':>10} {'ARI':>6}")
+    for engine in args.engine:
+        base = fit(Xf16, idx, args.clusters, {}, engine=engine)
+        base_inertia = original_inertia(Xf16, base.labels, args.clusters)
+        print(f"{engine:>10} {DIMS:>10} {0:>9.2f} {base.seconds:>10.2f} {1:>7.1f}x {base_inertia:>10.1f} {1:>6.2f}")
+        for method in ("pca", "random"):
+            for out_dims in args.dims:
+                proj_path = os.path.join(tmp, f"{method}{out_dims}.npz")
+                out_path = os.path.join(tmp, f"{method}{out_dims}.f16")
+                if not os.path.exists(out_path):
+                    t0 = time.perf_counter()
+                    _reduce_into(Xf16, args.points, method, out_dims, proj_path, out_path)
+                    reduce_seconds = time.perf_counter() - t0
+                else:
+                    reduce_seconds = 0.0  # already built for the previous engine
+                Xr = np.memmap(out_path, dtype=np.float16, mode="r", shape=(args.points, out_dims))
+                result = fit(Xr, idx, args.clusters, {}, engine=engine)
+                inertia = original_inertia(Xf16, result.labels, args.clusters)
+                print(f"{engine:>10} {f'{method}-{out_dims}':>10} {reduce_seconds:>9.2f} {result.seconds:>10.2f} "
+                      f"{base.seconds / result.seconds:>7.1f}x {inertia:>10.1f} {adjusted_rand_score(base.labels, result.labels):>6.2f}")
+    for name in os.listdir(tmp):
+        os.remove(os.path.join(tmp, name))
+    os.rmdir(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# Benchmark: building the clustering fp16 store from (point_id, emb256_f16) rows.
+#
+#   python scripts/bench_store_build.py                        # decode only, 100k / 1M / 5M synthetic rows
+#   python scripts/bench_store_build.py --sizes 100000 1000000
+#   python scripts/bench_store_build.py --db                   # also time the builders against DB_URL
+#
+# The synthetic runs isolate the client-side cost that used to dominate: the legacy per-row
+# np.frombuffer loop vs one decode per fetched batch vs the binary COPY sink. Rows are fed
+# from one pre-built 100k-row chunk, repeated, so memory stays flat at 5M.
+import argparse
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+from modules.cluster import store
+
+CHUNK = 100_000
+DIMS = 256
+
+
+def synthetic_chunk(dims: int = DIMS):
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((CHUNK, dims)).astype(np.float16)
+    rows = [(i, X[i].tobytes()) for i in range(CHUNK)]
+    # One COPY data message per tuple, as psycopg2 hands them to file.write()
+    messages = [struct.pack(">hiqi", 2, 8, pid, dims * 2) + emb for pid, emb in rows]
+    return rows, messages
+
+
+def legacy(paths, n, rows, messages, dims):
+    """The previous builder: 100-row fetches, one frombuffer + memmap assignment per row."""
+    ids_mm = np.memmap(paths[0], dtype=np.int64, mode="w+", shape=(n,))
+    X_mm = np.memmap(paths[1], dtype=np.float16, mode="w+", shape=(n, dims))
+    i = 0
+    while i < n:
+        for k in range(0, CHUNK, 100):
+            batch = rows[k:k + 100]
+            m = min(len(batch), n - i)
+            if m <= 0:
+                break
+            ids_mm[i:i + m] = [r[0] for r in batch[:m]]
+            for j in range(m):
+                X_mm[i + j] = np.frombuffer(batch[j][1], dtype=np.float16, count=dims)
+            i += m
+    ids_mm.flush(); X_mm.flush()
+
+
+def batched(paths, n, rows, messages, dims):
+    writer = store._StoreWriter(paths[0], paths[1], n, dims)
+    while writer.n < n:
+        for k in range(0, CHUNK, store.FETCH_BATCH):
+            writer.write_rows(rows[k:k + store.FETCH_BATCH])
+    writer.close()
+
+
+def copy_sink(paths, n, rows, messages, dims):
+    writer = store._StoreWriter(paths[0], paths[1], n, dims)
+    sink = store._BinaryCopySink(writer)
+    sink.write(b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0))
+    for _ in range(0, n, CHUNK):
+        for message in messages:
+            sink.write(message)
+    sink.write(b"\xff\xff")
+    sink.close()
+    writer.close()
+
+
+def time_it(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def bench_synthetic(sizes):
+    rows, messages = synthetic_chunk()
+    tmp = tempfile.mkdtemp()
+    paths = (os.path.join(tmp, "ids.dat"), os.path.join(tmp, "X.dat"))
+    print(f"{'rows':>10} {'method':>8} {'seconds':>9} {'rows/sec':>12} {'MB/sec':>8}")
+    for n in sizes:
+        for name, fn in (("legacy", legacy), ("batched", batched), ("copy", copy_sink)):
+            seconds = time_it(fn, paths, n, rows, messages, DIMS)
+            mb = n * (8 + DIMS * 2) / 1e6
+            print(f"{n:>10,} {name:>8} {seconds:>9.2f} {n / seconds:>12,.0f} {mb / seconds:>8.0f}")
+        for p in paths:
+            os.remove(p)
+
+
+def bench_db():
+    from modules.utils.database_utils import get_db_connection
+    conn = get_db_connection()
+    print(f"\n{'method':>8} {'shards':>6} {'rows':>10} {'seconds':>9} {'rows/sec':>12}")
+    runs = [("cursor", 1)] + [("copy", k) for k in (1, 2, 4, 8)]
+    for method, shards in runs:
+        t0 = time.perf_counter()
+        _, _, n, _ = store.build_local_fp16_store(conn, {}, job_id=999_999_999, method=method, shards=shards)
+        seconds = time.perf_counter() - t0
+        print(f"{method:>8} {shards:>6} {n:>10,} {seconds:>9.2f} {n / seconds if seconds else 0:>12,.0f}")
+        store.cleanup_store(999_999_999)
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--db", action="store_true", help="also build the full store from the database")
+    args = parser.parse_args()
+    bench_synthetic(args.sizes)
+    if args.db:
+        bench_db()
+
+
+if __name__ == "__main__":
+    main()
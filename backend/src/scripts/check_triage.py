@@ -0,0 +1,59 @@
+# Check: which short contributions the triage treats as procedural.
+#
+#   python scripts/check_triage.py
+#
+# Each line is run through Triage.skip_reason on its own; the script fails on the first
+# one whose verdict changed. Add a line here whenever a pattern in PROCEDURAL_PATTERNS is.
+import sys
+
+from modules.points.triage import Triage
+
+PROCEDURAL = [
+    "I beg to move, That the Bill be now read a Second time.",
+    "Order! Order. Order. Order.",
+    "I call the next speaker, Jim Shannon.",
+    "I call the hon. Member for Strangford.",
+    "I call the shadow Minister, Sarah Jones.",
+    "I call Sir Edward Leigh to speak now.",
+    "On a point of order, Madam Deputy Speaker.",
+    "That is not a point of order for the Chair.",
+    "The Question is, That the amendment be made.",
+    "Question put and agreed to.",
+    "The Ayes have it, the Ayes have it.",
+    "The House divided: Ayes 301, Noes 212.",
+    "Several hon. Members rose—",
+    "Hon. Members indicated dissent.",
+    "Mr Jim Shannon (Strangford) (DUP) rose—",
+    "Amendment made: 12, page 4, line 3.",
+    "With permission, Mr Speaker, I will answer questions 3 and 7 together.",
+]
+
+SUBSTANTIVE = [
+    "I call this a betrayal of every family on a waiting list.",
+    "I call on the Government to publish the impact assessment today.",
+    "I call upon the Minister to meet the families affected.",
+    "Rose Cottage Hospice will close next month unless funding is found.",
+    "Rosemary Street post office has lost half its footfall since the closure.",
+    "Prices rose by 11% last year and wages did not keep pace.",
+    "The question is whether the Minister will act before the summer.",
+    "Order books at the shipyard are empty for the first time in a decade.",
+    "On a point of order, Mr Speaker, the Minister has inadvertently misled the House about the figures.",
+    "Thank you, Mr Speaker, but the Minister has not answered my question.",
+]
+
+
+def main():
+    failures = []
+    for expected, lines in (("procedural", PROCEDURAL), (None, SUBSTANTIVE)):
+        for line in lines:
+            reason = Triage().skip_reason({"contribution_value": line}, set())
+            if reason != expected:
+                failures.append(f"expected {expected or 'kept'}, got {reason or 'kept'}: {line}")
+    for failure in failures:
+        print(failure)
+    print(f"{len(PROCEDURAL) + len(SUBSTANTIVE) - len(failures)}/{len(PROCEDURAL) + len(SUBSTANTIVE)} lines as expected")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -37,7 +37,10 @@ CREATE TABLE debate (
     location VARCHAR(255),
     debate_type_id VARCHAR(20),
     parent_ext_id VARCHAR(255) REFERENCES debate(ext_id),
-    analysed BOOLEAN DEFAULT FALSE
+    analysed BOOLEAN DEFAULT FALSE,
+    content_hash VARCHAR(64),
+    lease_owner TEXT,
+    lease_expires_at TIMESTAMPTZ
 );
 
 CREATE TABLE contribution (
@@ -51,14 +54,40 @@ CREATE TABLE contribution (
     order_in_section INTEGER,
     timecode VARCHAR(50),
     hrs_tag VARCHAR(50),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    points_extracted_at TIMESTAMPTZ,
+    skip_reason TEXT -- set when point generation's triage skipped the contribution (modules/points/triage.py)
 );
 
 CREATE TABLE point(
     point_id BIGSERIAL PRIMARY KEY,
     contribution_item_id VARCHAR(255) REFERENCES contribution(item_id),
     point_value TEXT,
-    point_embedding VECTOR(3072)
+    point_embedding VECTOR(3072),
+    emb256_f16 BYTEA -- first 256 dims, re-normalised, float16 (modules/points/embed.py::compact_embedding)
+);
+
+-- Incremental ingestion watermark per house (see modules/data/sync.py)
+CREATE TABLE sync_state (
+    house VARCHAR(50) PRIMARY KEY,
+    last_synced_date DATE,
+    cursor JSONB NOT NULL DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Debates loaded before their parent; linked when the parent arrives (see modules/data/bulk.py)
+CREATE TABLE debate_pending_parent (
+    ext_id VARCHAR(255) PRIMARY KEY REFERENCES debate(ext_id) ON DELETE CASCADE,
+    parent_ext_id VARCHAR(255) NOT NULL
+);
+
+-- Embeddings keyed by sha256(model, text); LRU-evicted by modules/points/embed_cache.py
+CREATE TABLE embedding_cache (
+    text_hash BYTEA PRIMARY KEY,
+    model TEXT NOT NULL,
+    embedding BYTEA NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    last_used TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
 CREATE TABLE cluster_jobs (
@@ -90,6 +119,16 @@ CREATE TABLE cluster_points (
     PRIMARY KEY (cluster_id, point_id)
 );
 
+-- Per-node centroids, for warm-starting later jobs with overlapping filters (modules/cluster/warm.py)
+CREATE TABLE cluster_centroids (
+    cluster_id INTEGER PRIMARY KEY REFERENCES clusters(cluster_id) ON DELETE CASCADE,
+    job_id BIGINT REFERENCES cluster_jobs(job_id),
+    path TEXT NOT NULL,     -- k-means labels from the root, e.g. '' (root), '2', '2/0'
+    space TEXT NOT NULL,    -- 'raw256', or the projection's key when clustered on a reduction
+    centroid BYTEA,         -- float32, in `space`; NULL for the root
+    projection BYTEA        -- root only: the job's projection (.npz), if any
+);
+
 
 -- ESSENTIAL INDEXES (huge performance gains for clustering):
 
@@ -100,6 +139,7 @@ CREATE INDEX idx_clusters_layer ON clusters(layer);
 -- Point-cluster relationships (junction table)
 CREATE INDEX idx_cluster_points_cluster ON cluster_points(cluster_id);
 CREATE INDEX idx_cluster_points_point ON cluster_points(point_id);
+CREATE INDEX idx_cluster_centroids_job ON cluster_centroids(job_id);
 
 -- Data retrieval for clustering
 CREATE INDEX idx_contribution_debate ON contribution(debate_ext_id);
@@ -110,6 +150,12 @@ CREATE INDEX idx_point_contribution ON point(contribution_item_id);
 CREATE INDEX idx_debate_date ON debate(date);
 CREATE INDEX idx_debate_house ON debate(house);
 
+-- Point-generation work queue (claim_debates)
+CREATE INDEX idx_debate_unanalysed ON debate(ext_id) WHERE analysed IS FALSE;
+
+-- Embedding cache eviction
+CREATE INDEX idx_embedding_cache_last_used ON embedding_cache(last_used);
+
 -- NICE TO HAVE INDEXES:
 
 -- Cluster analysis/reporting